@@ -0,0 +1,112 @@
+"""
+Benchmarks for utils.CallableCache
+
+run from the project root with `python -m benchmarks.callable_cache_bench`
+"""
+import functools
+import threading
+import time
+import timeit
+from typing import List
+
+from utils.CallableCache import CallableCache
+
+THREADS: int = 64
+ROUNDS: int = 5
+REFRESH_RATE: float = 0.2
+COMPUTE_SECS: float = 0.05
+HITS: int = 200_000
+STATS_CALLS: int = 200
+
+
+def stampede(serve_stale: bool) -> List[int]:
+    """
+    Lets [THREADS] threads hit an expired cache at the same time, once per round
+    :return: the number of callable invocations per expiry
+    """
+    invocations: List[int] = [0]
+    invocations_lock = threading.Lock()
+
+    def expensive_query() -> int:
+        with invocations_lock:
+            invocations[0] += 1
+        time.sleep(COMPUTE_SECS)
+        return invocations[0]
+
+    cache = CallableCache(refresh_rate=REFRESH_RATE, callable=expensive_query, serve_stale=serve_stale)
+    cache()
+    per_expiry: List[int] = []
+    for _ in range(ROUNDS):
+        time.sleep(REFRESH_RATE)
+        before: int = invocations[0]
+        barrier = threading.Barrier(THREADS)
+
+        def worker():
+            barrier.wait()
+            cache()
+
+        threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        per_expiry.append(invocations[0] - before)
+    return per_expiry
+
+
+def per_hit_cost(refresh_rate) -> float:
+    """
+    :return: the nanoseconds a cache hit takes with the given [refresh_rate]
+    """
+    cache = CallableCache(refresh_rate=refresh_rate, callable=lambda x: x)
+    cache(1)
+    return timeit.timeit(lambda: cache(1), number=HITS) / HITS * 1e9
+
+
+def stats_under_load(hitters: int = 4) -> int:
+    """
+    Calls `get_stats` [STATS_CALLS] times while [hitters] threads hit the cache, which reorders its entries
+    :return: the number of `get_stats` calls that failed
+    """
+    cache = CallableCache(refresh_rate=60, callable=lambda x: [x] * 100, maxsize=None)
+    for i in range(1000):
+        cache(i)
+    stopped = threading.Event()
+
+    def hitter():
+        while not stopped.is_set():
+            for i in range(1000):
+                cache(i)
+
+    threads = [threading.Thread(target=hitter) for _ in range(hitters)]
+    for thread in threads:
+        thread.start()
+    failures: int = 0
+    try:
+        for _ in range(STATS_CALLS):
+            try:
+                cache.get_stats()
+            except RuntimeError:
+                failures += 1
+    finally:
+        stopped.set()
+        for thread in threads:
+            thread.join()
+    return failures
+
+
+def main():
+    for serve_stale in (False, True):
+        per_expiry = stampede(serve_stale)
+        print(f"{THREADS} threads, serve_stale={serve_stale}: callable invocations per expiry {per_expiry}")
+
+    reference = functools.lru_cache()(lambda x: x)
+    reference(1)
+    print(f"functools.lru_cache hit: {timeit.timeit(lambda: reference(1), number=HITS) / HITS * 1e9:.0f} ns")
+    for refresh_rate in (60, "never", "03:00", "08:30,17:00", "*/15 6-18 * * 1-5"):
+        print(f"CallableCache hit, refresh_rate={refresh_rate!r}: {per_hit_cost(refresh_rate):.0f} ns")
+    print(f"get_stats while 4 threads hit the cache: {stats_under_load()} of {STATS_CALLS} calls failed")
+
+
+if __name__ == "__main__":
+    main()
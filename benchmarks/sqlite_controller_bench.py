@@ -0,0 +1,214 @@
+"""
+Benchmarks for utils.SqliteController
+
+run from the project root with `python -m benchmarks.sqlite_controller_bench`
+"""
+import functools
+import os
+import time
+import timeit
+from typing import Any, Dict, List, Optional, Tuple, Callable
+
+from pandas import DataFrame
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from utils.SqliteController import SqliteController, dispose_engines
+from utils.SqliteWriter import SqliteWriter
+from utils.filehandler import to_abs_file_path, delete_file
+from utils.multi_threaded import multi_threaded
+
+DB_FILE: str = "sqlite_controller_bench.db"
+QUERIES: int = 2000
+ROWS: int = 1_000_000
+READERS: int = 8
+WRITERS: int = 4
+OPERATIONS: int = 300
+
+
+def _select_without_pool(db_file: str, keys: Dict[str, Any]) -> Any:
+    """
+    How a query was made before the engine registry: a new engine per controller and a new sessionmaker per call
+    """
+    engine = create_engine(f'sqlite:////{to_abs_file_path(db_file)}', connect_args={'timeout': 60})
+    session: Session = sessionmaker(engine)()
+    result = list(session.execute(text("SELECT * FROM bench WHERE id = :id"), keys))
+    session.connection().close()
+    return result
+
+
+def small_query_latency(shared_controller: bool) -> float:
+    """
+    :param shared_controller: if all queries use the same controller, otherwise each query creates one
+    :return: the microseconds a select of one row takes
+    """
+    if shared_controller:
+        controller = SqliteController(DB_FILE)
+        seconds: float = timeit.timeit(lambda: controller.select("bench", {"id": 1}), number=QUERIES)
+    else:
+        seconds = timeit.timeit(lambda: SqliteController(DB_FILE).select("bench", {"id": 1}), number=QUERIES)
+    return seconds / QUERIES * 1e6
+
+
+def bulk_insert_rate(chunk_size: int) -> float:
+    """
+    Inserts [ROWS] rows from a generator
+    :return: the inserted rows per minute
+    """
+    controller = SqliteController(DB_FILE)
+    controller.create_table(f"bulk_{chunk_size}", ["id INTEGER PRIMARY KEY", "name TEXT", "value REAL"])
+    seconds: float = timeit.timeit(lambda: controller.insert(f"bulk_{chunk_size}",
+                                                              ({"id": i, "name": f"row{i}", "value": i / 2}
+                                                               for i in range(ROWS)), chunk_size=chunk_size),
+                                   number=1)
+    return ROWS / seconds * 60
+
+
+def bulk_update_rate(method: str, rows: int) -> float:
+    """
+    Updates [rows] rows of a table with [ROWS] rows by their primary key
+    :param method: "update" runs the `update` method once per row, "executemany" and "staged" `bulk_update`
+    :return: the updated rows per minute
+    """
+    controller = SqliteController(DB_FILE)
+    entries = ({"id": i, "value": i * 2} for i in range(rows))
+    if method == "update":
+        seconds: float = timeit.timeit(lambda: [controller.update("bulk_update", [{"value": entry["value"]}],
+                                                                  where=f"id = {entry['id']}") for entry in entries],
+                                       number=1)
+    else:
+        seconds = timeit.timeit(lambda: controller.bulk_update("bulk_update", "id", entries,
+                                                               staged=method == "staged"), number=1)
+    return rows / seconds * 60
+
+
+def frame_seconds(columnar: bool) -> float:
+    """
+    Selects the [ROWS] rows of the "bulk_update" table into a DataFrame
+    :param columnar: if `select_frame` is used, otherwise the DataFrame is built from the rows of `select`
+    :return: the seconds it takes
+    """
+    controller = SqliteController(DB_FILE)
+    if columnar:
+        return timeit.timeit(lambda: controller.select_frame("bulk_update"), number=1)
+    return timeit.timeit(lambda: DataFrame([dict(row._mapping) for row in controller.select("bulk_update")]),
+                         number=1)
+
+
+class _MixedLoad:
+    """
+    Readers that select single rows and writers that insert single rows, each in its own transaction
+    """
+
+    def __init__(self, controller: SqliteController):
+        self.controller: SqliteController = controller
+
+    def read(self) -> int:
+        for i in range(OPERATIONS):
+            self.controller.select("mixed", {"id": i})
+        return OPERATIONS
+
+    def write(self, writer: int) -> int:
+        for i in range(OPERATIONS):
+            self.controller.insert("mixed", [{"id": (writer + 1) * 1_000_000 + i, "name": f"row{i}"}])
+        return OPERATIONS
+
+
+def mixed_load_rate(profile: Optional[str]) -> float:
+    """
+    Runs [READERS] reading and [WRITERS] writing threads with `multi_threaded` on a fresh database
+    :return: the operations per second
+    """
+    db_file: str = f"sqlite_controller_bench_{profile}.db"
+    controller = SqliteController(db_file, profile=profile, pool_size=READERS + WRITERS)
+    controller.create_table("mixed", ["id INTEGER PRIMARY KEY", "name TEXT"])
+    controller.insert("mixed", ({"id": i, "name": f"row{i}"} for i in range(OPERATIONS)))
+    load = _MixedLoad(controller)
+    funcs: List[Tuple[Callable, List[Any], str]] = [(load.read, [], f"reader{i}") for i in range(READERS)]
+    funcs.extend((load.write, [i], f"writer{i}") for i in range(WRITERS))
+    try:
+        start: float = time.perf_counter()
+        operations: int = sum(multi_threaded(funcs).values())
+        return operations / (time.perf_counter() - start)
+    finally:
+        dispose_engines()
+        for ending in ("", "-wal", "-shm"):
+            if os.path.exists(to_abs_file_path(db_file + ending)):
+                delete_file(db_file + ending)
+
+
+class _SmallInserts:
+    """
+    Threads that insert single rows with [insert]
+    """
+
+    def __init__(self, insert: Callable[[List[Dict[str, Any]]], Any]):
+        self.insert: Callable[[List[Dict[str, Any]]], Any] = insert
+
+    def write(self, writer: int) -> int:
+        for i in range(OPERATIONS):
+            self.insert([{"id": (writer + 1) * 1_000_000 + i, "name": f"row{i}"}])
+        return OPERATIONS
+
+
+def small_insert_rate(use_writer: bool, wait: bool) -> float:
+    """
+    Lets [READERS] + [WRITERS] threads insert single rows into a database with the "durable" profile
+    :param use_writer: if the rows are enqueued to a `SqliteWriter` instead of inserted by the threads
+    :param wait: if each thread waits until its row is committed before inserting the next one
+    :return: the inserted rows per second
+    """
+    db_file: str = f"sqlite_controller_bench_writer_{use_writer}_{wait}.db"
+    controller = SqliteController(db_file, profile="durable", pool_size=READERS + WRITERS)
+    controller.create_table("small_inserts", ["id INTEGER PRIMARY KEY", "name TEXT"])
+    writer: Optional[SqliteWriter] = SqliteWriter(controller) if use_writer else None
+    if writer is None:
+        insert: Callable[[List[Dict[str, Any]]], Any] = functools.partial(controller.insert, "small_inserts")
+    elif wait:
+        insert = lambda entries: writer.insert("small_inserts", entries).result()
+    else:
+        insert = functools.partial(writer.insert, "small_inserts")
+    load = _SmallInserts(insert)
+    funcs: List[Tuple[Callable, List[Any], str]] = [(load.write, [i], f"writer{i}") for i in range(READERS + WRITERS)]
+    try:
+        start: float = time.perf_counter()
+        rows: int = sum(multi_threaded(funcs).values())
+        if writer is not None:
+            writer.close()
+        return rows / (time.perf_counter() - start)
+    finally:
+        dispose_engines()
+        for ending in ("", "-wal", "-shm"):
+            if os.path.exists(to_abs_file_path(db_file + ending)):
+                delete_file(db_file + ending)
+
+
+def main():
+    controller = SqliteController(DB_FILE)
+    controller.create_table("bench", ["id INTEGER PRIMARY KEY", "name TEXT"])
+    try:
+        seconds: float = timeit.timeit(lambda: _select_without_pool(DB_FILE, {"id": 1}), number=QUERIES // 10)
+        print(f"select without engine registry: {seconds / (QUERIES // 10) * 1e6:.0f} us")
+        for shared_controller in (False, True):
+            print(f"select with engine registry, shared_controller={shared_controller}: "
+                  f"{small_query_latency(shared_controller):.0f} us")
+        for chunk_size in (1_000, 10_000, 100_000):
+            print(f"bulk insert of {ROWS} rows, chunk_size={chunk_size}: {bulk_insert_rate(chunk_size):,.0f} rows/min")
+        controller.create_table("bulk_update", ["id INTEGER PRIMARY KEY", "name TEXT", "value REAL"])
+        controller.insert("bulk_update", ({"id": i, "name": f"row{i}", "value": 0} for i in range(ROWS)))
+        for method, rows in (("update", QUERIES), ("executemany", ROWS), ("staged", ROWS)):
+            print(f"update of {rows} rows with {method}: {bulk_update_rate(method, rows):,.0f} rows/min")
+        for columnar in (False, True):
+            print(f"DataFrame of {ROWS} rows, columnar={columnar}: {frame_seconds(columnar):.2f} s")
+    finally:
+        dispose_engines()
+        os.remove(to_abs_file_path(DB_FILE))
+    for profile in (None, "durable", "fast-ingest", "read-heavy"):
+        print(f"{READERS} readers and {WRITERS} writers, profile={profile}: {mixed_load_rate(profile):.0f} operations/s")
+    for use_writer, wait in ((False, True), (True, True), (True, False)):
+        print(f"{READERS + WRITERS} threads inserting single rows, use_writer={use_writer}, wait={wait}: "
+              f"{small_insert_rate(use_writer, wait):.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
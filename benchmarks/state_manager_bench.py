@@ -0,0 +1,104 @@
+"""
+Benchmarks for utils.StateManager
+
+run from the project root with `python -m benchmarks.state_manager_bench`
+"""
+import threading
+import time
+import timeit
+from typing import Any, Dict, List
+
+from utils.StateManager import StateManager, Subscriber, _LockStripes, State
+
+SUBSCRIBERS: int = 50
+SETS: int = 20
+WRITERS: int = 32
+WRITES: int = 2000
+ASSIGNMENTS: int = 100_000
+
+
+def _large_state(version: int) -> Dict[str, Any]:
+    return {f"sensor{i}": {"values": list(range(20)), "tags": {"a", "b"}, "version": version} for i in range(500)}
+
+
+def set_state_cost(immutable: bool) -> float:
+    """
+    :return: the milliseconds a set_state of a large dict state with [SUBSCRIBERS] subscribers takes
+    """
+    state_manager = StateManager()
+    state_name: str = f"bench_{immutable}"
+    state_manager.set_state(state_name, _large_state(0), immutable=immutable)
+    for i in range(SUBSCRIBERS):
+        state_manager.subscribe(state_name, Subscriber(id=f"subscriber{i}", callback=lambda state: None))
+    states = [_large_state(version) for version in range(SETS)]
+    seconds: float = timeit.timeit(lambda: state_manager.set_state(state_name, states.pop()), number=SETS)
+    return seconds / SETS * 1000
+
+
+def contention(stripes: int, shared_state: bool) -> float:
+    """
+    Lets [WRITERS] threads call set_state [WRITES] times each at the same time
+    :param stripes: the number of lock stripes, 1 is a global lock
+    :param shared_state: if all threads write the same state, otherwise each thread writes its own
+    :return: the set_state calls per second
+    """
+    state_manager = StateManager()
+    locks: _LockStripes = StateManager._locks
+    StateManager._locks = _LockStripes(stripes)
+    try:
+        barrier = threading.Barrier(WRITERS + 1)
+
+        def writer(index: int):
+            state_name: str = f"contention_{stripes}_{shared_state}_{0 if shared_state else index}"
+            value: Dict[str, Any] = {"writer": index, "values": list(range(10))}
+            barrier.wait()
+            for _ in range(WRITES):
+                state_manager.set_state(state_name, value)
+
+        threads: List[threading.Thread] = [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start: float = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return WRITERS * WRITES / (time.perf_counter() - start)
+    finally:
+        StateManager._locks = locks
+
+
+class _Sensor(State):
+    value: int = 0
+    readings: list = None
+
+
+class _CompiledSensor(State, descriptors=True):
+    value: int = 0
+    readings: list = None
+
+
+def assignment_cost(cls: type, attribute: str) -> float:
+    """
+    :return: the nanoseconds an assignment of [attribute] of an instance of the `State` subclass [cls] takes,
+             while another attribute has a subscriber
+    """
+    sensor = cls()
+    sensor.subscribe(Subscriber(id="subscriber", callback=lambda state: None), "value")
+    readings: List[int] = list(range(100))
+    return timeit.timeit(lambda: setattr(sensor, attribute, readings), number=ASSIGNMENTS) / ASSIGNMENTS * 1e9
+
+
+def main():
+    for immutable in (False, True):
+        print(f"set_state with {SUBSCRIBERS} subscribers, immutable={immutable}: {set_state_cost(immutable):.2f} ms")
+    for shared_state in (False, True):
+        for stripes in (1, 64):
+            print(f"{WRITERS} writers, shared_state={shared_state}, {stripes} lock stripes: "
+                  f"{contention(stripes, shared_state):.0f} set_state/s")
+    for cls in (_Sensor, _CompiledSensor):
+        for attribute in ("readings", "_cache"):
+            print(f"{cls.__name__}.{attribute} assignment: {assignment_cost(cls, attribute):.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+############### requirements ###############
+#
+# sqlalchemy
+#
+# .filehandler
+# .SqliteController
+#
+############################################
+import hashlib
+import os
+import pickle
+import threading
+import time
+from typing import Any, Optional, Tuple, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .SqliteController import SqliteController, _sessioning
+from .filehandler import to_abs_file_path, create_dir, save_file, load_file, get_files_in_dir
+
+
+class CacheStore:
+    """
+    A persistent second tier for a `CallableCache`.
+    Keys are strings that are the same across processes, expiries are unix timestamps or None for never.
+    """
+
+    def load(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        """
+        :param key: the key of the entry
+        :return: a tuple of the value and its expiry or None if there is no such entry
+        """
+        raise NotImplementedError
+
+    def store(self, key: str, value: Any, expires_at: Optional[float]) -> None:
+        """
+        Stores an entry, replacing an existing one with the same [key]
+        :param key: the key of the entry
+        :param value: the value, it has to be picklable
+        :param expires_at: the unix timestamp the entry expires at, None if it never does
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        """
+        Removes an entry, if it exists
+        :param key: the key of the entry
+        """
+        raise NotImplementedError
+
+
+class PickleCacheStore(CacheStore):
+    """
+    Stores each entry as pickle file in [directory] (relative to the project root).
+
+    Files are written to a temporary file first and then atomically moved in place, so several processes
+    can share the directory. If there are more than [maxsize] entries, the least recently used ones are removed.
+
+    ```python
+    class Repository:
+        @callable_cache(refresh_rate=3600, store=PickleCacheStore("cache"))
+        def get_report(self, year: int):
+            ...
+    ```
+    """
+
+    def __init__(self, directory: str, maxsize: int = 1000):
+        self._directory: str = directory
+        self.maxsize: int = maxsize
+        self._evict_every: int = max(1, maxsize // 100)
+        self._stores_since_eviction: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._directory})"
+
+    def load(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        file_path: str = self._get_file_path(key)
+        try:
+            stored: Optional[Tuple[str, Any, Optional[float]]] = load_file(file_path, is_abs=True)
+        except OSError:
+            # it got evicted or replaced by another process in the meantime
+            return None
+        if stored is None:
+            return None
+        stored_key, value, expires_at = stored
+        if stored_key != key:
+            return None
+        if expires_at is not None and expires_at <= time.time():
+            self._remove(file_path)
+            return None
+        try:
+            os.utime(file_path)
+        except OSError:
+            pass
+        return value, expires_at
+
+    def store(self, key: str, value: Any, expires_at: Optional[float]) -> None:
+        create_dir(self._directory)
+        file_path: str = self._get_file_path(key)
+        tmp_file_path: str = f"{file_path[:-len('.pickl')]}.{os.getpid()}-{threading.get_ident()}.tmp.pickl"
+        save_file(tmp_file_path, (key, value, expires_at), is_abs=True)
+        os.replace(tmp_file_path, file_path)
+
+        with self._lock:
+            self._stores_since_eviction += 1
+            if self._stores_since_eviction < self._evict_every:
+                return
+            self._stores_since_eviction = 0
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        self._remove(self._get_file_path(key))
+
+    def _get_file_path(self, key: str) -> str:
+        return os.path.join(to_abs_file_path(self._directory), f"{hashlib.sha1(key.encode()).hexdigest()}.pickl")
+
+    def _evict(self) -> None:
+        files: List[str] = [file for file in get_files_in_dir(self._directory, endings=["pickl"]) or []
+                            if not file.endswith(".tmp.pickl")]
+        if len(files) <= self.maxsize:
+            return
+        access_times: List[Tuple[float, str]] = []
+        for file in files:
+            try:
+                access_times.append((os.path.getmtime(file), file))
+            except OSError:
+                continue
+        access_times.sort()
+        for _, file in access_times[:len(access_times) - self.maxsize]:
+            self._remove(file)
+
+    @staticmethod
+    def _remove(file_path: str) -> None:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+
+class SqliteCacheStore(SqliteController, CacheStore):
+    """
+    Stores the entries in a table of a sqlite database.
+
+    Sqlite's locking makes it safe to share the database between processes. The table is created lazily.
+    If there are more than [maxsize] entries, the least recently used ones are removed.
+
+    ```python
+    class Repository:
+        @callable_cache(refresh_rate="03:00", store=SqliteCacheStore("cache.db"))
+        def get_report(self, year: int):
+            ...
+    ```
+    """
+    maxsize: int
+    _table_name: str
+    _is_table_created: bool = False
+
+    def __init__(self, db_file: str, maxsize: int = 10000, table_name: str = "callable_cache", timeout: int = 60):
+        super().__init__(db_file, timeout=timeout)
+        self.maxsize = maxsize
+        self._table_name = table_name
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._db_file}, {self._table_name})"
+
+    def load(self, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        self._create_table()
+        return self._load(key)
+
+    def store(self, key: str, value: Any, expires_at: Optional[float]) -> None:
+        self._create_table()
+        self._store(key, pickle.dumps(value), expires_at)
+
+    def delete(self, key: str) -> None:
+        self._create_table()
+        self._delete(key)
+
+    def _create_table(self):
+        if self._is_table_created:
+            return
+        self.create_table(self._table_name, ["key TEXT PRIMARY KEY", "value BLOB", "expires_at REAL",
+                                             "accessed_at REAL"])
+        self._create_index()
+        self._is_table_created = True
+
+    @_sessioning()
+    def _create_index(self, _session: Session = None):
+        _session.execute(text(f"CREATE INDEX IF NOT EXISTS {self._table_name}_accessed_at "
+                              f"ON {self._table_name} (accessed_at)"))
+        _session.commit()
+
+    @_sessioning()
+    def _load(self, key: str, _session: Session = None) -> Optional[Tuple[Any, Optional[float]]]:
+        row = _session.execute(text(f"SELECT value, expires_at FROM {self._table_name} WHERE key = :key"),
+                               {"key": key}).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            _session.execute(text(f"DELETE FROM {self._table_name} WHERE key = :key"), {"key": key})
+            _session.commit()
+            return None
+        _session.execute(text(f"UPDATE {self._table_name} SET accessed_at = :now WHERE key = :key"),
+                         {"key": key, "now": time.time()})
+        _session.commit()
+        return pickle.loads(value), expires_at
+
+    @_sessioning()
+    def _store(self, key: str, value: bytes, expires_at: Optional[float], _session: Session = None):
+        _session.execute(text(f"INSERT OR REPLACE INTO {self._table_name} (key, value, expires_at, accessed_at) "
+                              f"VALUES (:key, :value, :expires_at, :now)"),
+                         {"key": key, "value": value, "expires_at": expires_at, "now": time.time()})
+        _session.execute(text(f"DELETE FROM {self._table_name} WHERE key IN "
+                              f"(SELECT key FROM {self._table_name} ORDER BY accessed_at DESC "
+                              f"LIMIT -1 OFFSET :maxsize)"),
+                         {"maxsize": self.maxsize})
+        _session.commit()
+
+    @_sessioning()
+    def _delete(self, key: str, _session: Session = None):
+        _session.execute(text(f"DELETE FROM {self._table_name} WHERE key = :key"), {"key": key})
+        _session.commit()
@@ -1,16 +1,337 @@
+import asyncio
+import bisect
 import datetime
 import functools
-from dataclasses import dataclass
-from typing import Optional, Any, Union, Callable, List
+import hashlib
+import inspect
+import itertools
+import logging
+import math
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, Any, Union, Callable, List, Dict, Tuple, Hashable, FrozenSet, TYPE_CHECKING
+
+from .util import get_deep_size
+
+if TYPE_CHECKING:
+    from .CacheStore import CacheStore
+
+
+class _KeyMark:
+    """
+    A marker inside of a cache key, e.g. to separate args from kwargs.
+    It has a stable repr, so keys can be digested across processes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"<{self.name}>"
+
+
+_KWARGS_MARK = _KeyMark("kwargs")
+_LIST_MARK = _KeyMark("list")
+_DICT_MARK = _KeyMark("dict")
+_SET_MARK = _KeyMark("set")
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+REFRESH_WORKERS: int = 4
+
+_CACHE_CREATION_LOCK: threading.Lock = threading.Lock()
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_executor_lock: threading.Lock = threading.Lock()
+_REGISTRY: "weakref.WeakSet[CallableCache]" = weakref.WeakSet()
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    """
+    :return: the worker pool shared by all caches for background refreshes. It is created on first usage
+    """
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _refresh_executor_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS,
+                                                       thread_name_prefix="CallableCache-refresh")
+    return _refresh_executor
+
+
+def _freeze(value: Any) -> Hashable:
+    """
+    Converts an unhashable value recursively into a hashable one.
+    Dicts and sets are sorted, so equal values result in equal keys regardless of their insertion order.
+    Anything that is still unhashable is represented by its repr.
+    """
+    if isinstance(value, tuple):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, list):
+        return (_LIST_MARK,) + tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return (_DICT_MARK,) + tuple(sorted(((_freeze(k), _freeze(v)) for k, v in value.items()), key=repr))
+    if isinstance(value, (set, frozenset)):
+        return (_SET_MARK,) + tuple(sorted((_freeze(item) for item in value), key=repr))
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def make_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Hashable:
+    """
+    Builds the cache key of a call.
+    If all arguments are hashable, they are used as they are. Otherwise they get frozen (see `_freeze`)
+    :param args: the positional arguments of the call
+    :param kwargs: the keyword arguments of the call
+    :return: a hashable key
+    """
+    key: Tuple[Any, ...] = args
+    if kwargs:
+        key += (_KWARGS_MARK,) + tuple(sorted(kwargs.items()))
+    try:
+        hash(key)
+        return key
+    except TypeError:
+        return _freeze(key)
+
+
+class _Schedule:
+    """
+    Determines when a cached value expires. It is parsed once from a refresh_rate
+    """
+
+    def get_ttl(self) -> float:
+        """
+        :return: for how many seconds a value stored now is valid, math.inf if it never expires
+        """
+        raise NotImplementedError
+
+
+class _IntervalSchedule(_Schedule):
+    def __init__(self, seconds: float):
+        self.seconds: float = seconds
+
+    def get_ttl(self) -> float:
+        return self.seconds
+
+
+class _DailySchedule(_Schedule):
+    """
+    Expires at the next of the given times of day, parsed from e.g. "03:00" or "08:30,17:00"
+    """
+
+    def __init__(self, spec: str):
+        self.times: List[datetime.time] = sorted(
+            datetime.time(*(int(part) for part in time_spec.split(":"))) for time_spec in spec.split(","))
+
+    def get_ttl(self) -> float:
+        now: datetime.datetime = datetime.datetime.now()
+        index: int = bisect.bisect_right(self.times, now.time())
+        if index < len(self.times):
+            next_date: datetime.datetime = datetime.datetime.combine(now.date(), self.times[index])
+        else:
+            next_date = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), self.times[0])
+        return (next_date - now).total_seconds()
+
+
+class _CronSchedule(_Schedule):
+    """
+    Expires at the next match of a cron expression "minute hour day_of_month month day_of_week",
+    e.g. "*/15 6-18 * * 1-5". Fields support "*", numbers, ranges, lists and steps. Sunday is 0 or 7.
+    """
+    _RANGES: List[Tuple[int, int]] = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+    def __init__(self, spec: str):
+        fields: List[str] = spec.split()
+        if len(fields) != 5:
+            raise ValueError(f"{spec} has not 5 fields")
+        minutes, hours, days, months, weekdays = (self._parse_field(field_, *range_)
+                                                  for field_, range_ in zip(fields, self._RANGES))
+        self.times: List[datetime.time] = [datetime.time(hour, minute)
+                                           for hour, minute in itertools.product(sorted(hours), sorted(minutes))]
+        self.days: FrozenSet[int] = days
+        self.months: FrozenSet[int] = months
+        self.weekdays: FrozenSet[int] = frozenset(weekday % 7 for weekday in weekdays)
+        self.is_day_restricted: bool = fields[2] != "*"
+        self.is_weekday_restricted: bool = fields[4] != "*"
+
+    @staticmethod
+    def _parse_field(field_: str, lowest: int, highest: int) -> FrozenSet[int]:
+        values: set = set()
+        for part in field_.split(","):
+            range_part, _, step = part.partition("/")
+            if range_part == "*":
+                start, end = lowest, highest
+            elif "-" in range_part:
+                start, end = (int(bound) for bound in range_part.split("-"))
+            else:
+                start = end = int(range_part)
+            if start < lowest or end > highest or start > end:
+                raise ValueError(f"{part} is out of range {lowest}-{highest}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return frozenset(values)
+
+    def _matches_date(self, date: datetime.date) -> bool:
+        if date.month not in self.months:
+            return False
+        day_matches: bool = date.day in self.days
+        weekday_matches: bool = (date.weekday() + 1) % 7 in self.weekdays
+        # like cron: if both are restricted, either of them has to match
+        if self.is_day_restricted and self.is_weekday_restricted:
+            return day_matches or weekday_matches
+        return day_matches and weekday_matches
+
+    def get_next(self, now: datetime.datetime) -> Optional[datetime.datetime]:
+        """
+        :return: the first match after [now] or None if there is none within the next 4 years
+        """
+        for days in range(366 * 4 + 1):
+            date: datetime.date = now.date() + datetime.timedelta(days=days)
+            if not self._matches_date(date):
+                continue
+            index: int = bisect.bisect_right(self.times, now.time().replace(second=0, microsecond=0)) \
+                if days == 0 else 0
+            if index < len(self.times):
+                return datetime.datetime.combine(date, self.times[index])
+
+    def get_ttl(self) -> float:
+        now: datetime.datetime = datetime.datetime.now()
+        next_date: Optional[datetime.datetime] = self.get_next(now)
+        return (next_date - now).total_seconds() if next_date else math.inf
+
+
+def _parse_refresh_rate(refresh_rate: Union[int, float, str]) -> _Schedule:
+    if not isinstance(refresh_rate, str):
+        return _IntervalSchedule(refresh_rate)
+    if refresh_rate.lower() == "never":
+        return _IntervalSchedule(math.inf)
+    if len(refresh_rate.split()) == 5:
+        return _CronSchedule(refresh_rate)
+    return _DailySchedule(refresh_rate)
+
+
+@dataclass
+class CacheStats:
+    """
+    A snapshot of the statistics of a `CallableCache`.
+    Being a dataclass it can be exported with the filehandler, e.g. `save_file("cache_stats.csv", get_cache_stats())`
+    """
+    name: str
+    hits: int
+    misses: int
+    refreshes: int
+    evictions: int
+    store_hits: int
+    average_compute_secs: float
+    size: int
+    bytes: int
+
+    @property
+    def hit_rate(self) -> float:
+        calls: int = self.hits + self.misses + self.refreshes
+        return self.hits / calls if calls else 0.0
 
 
 @dataclass
+class _CacheEntry:
+    """
+    [expires_at] and [refresh_at] are time.monotonic() deadlines, math.inf if there is none
+    """
+    value: Any
+    expires_at: float
+    refresh_at: float
+
+    def is_expired(self, now: float) -> bool:
+        return self.expires_at <= now
+
+    def needs_refresh(self, now: float) -> bool:
+        return self.refresh_at <= now
+
+
+class _Flight:
+    """
+    A running computation of one key. Other callers of the same key wait for its result instead of computing it again.
+    """
+
+    def __init__(self):
+        self.done: threading.Event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+@dataclass(eq=False)
 class CallableCache:
-    refresh_rate: Union[int, str]
-    callable: Callable[[], Any]
-    cache: Any = None
-    last_updated: Optional[datetime.datetime] = None
+    """
+    Caches the results of [callable] per argument combination.
+
+    [refresh_rate] is either the time to live of an entry in seconds, "HH:MM" (or a list like "08:30,17:00") for a
+    daily refresh, a cron expression like "0 */6 * * *" or "never". It is parsed once on construction.
+    At most [maxsize] entries are kept, the least recently used one is evicted first. None means unbounded.
+
+    It is thread safe: only one caller recomputes an expired key, concurrent callers of that key wait for its result.
+    If [serve_stale] is set, they get the expired value instead of waiting.
+
+    With [stale_while_revalidate] an expired value is returned immediately, while it is refreshed on a background
+    worker. [refresh_ahead] starts that background refresh before the expiry, as fraction of the time to live
+    (e.g. 0.1 refreshes within the last 10%). [jitter] adds up to that many random seconds to each expiry,
+    so entries stored together do not expire together.
+    If a background refresh fails, the last value is kept and the refresh is retried after [retry_after] seconds,
+    without [stale_while_revalidate] at the latest when the value expires.
+
+    A [store] (see `CacheStore`) adds a persistent second tier: computed values are written through to it and
+    entries missing in memory are looked up there first, so they survive restarts.
+
+    Every cache registers itself, see `get_caches`, `get_cache_stats` and `invalidate_caches`.
+    """
+    refresh_rate: Union[int, float, str]
+    callable: Callable[..., Any]
     key: Optional[str] = None
+    maxsize: Optional[int] = 128
+    serve_stale: bool = False
+    stale_while_revalidate: bool = False
+    refresh_ahead: float = 0.0
+    jitter: float = 0.0
+    retry_after: float = 5.0
+    store: Optional["CacheStore"] = None
+    _entries: "OrderedDict[Hashable, _CacheEntry]" = field(default_factory=OrderedDict, init=False, repr=False)
+    _in_flight: Dict[Hashable, _Flight] = field(default_factory=dict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
+    _schedule: _Schedule = field(init=False, repr=False, compare=False)
+    _hits: int = field(default=0, init=False, repr=False)
+    _misses: int = field(default=0, init=False, repr=False)
+    _refreshes: int = field(default=0, init=False, repr=False)
+    _evictions: int = field(default=0, init=False, repr=False)
+    _store_hits: int = field(default=0, init=False, repr=False)
+    _computations: int = field(default=0, init=False, repr=False)
+    _compute_secs: float = field(default=0.0, init=False, repr=False)
+
+    def __post_init__(self):
+        try:
+            self._schedule = _parse_refresh_rate(self.refresh_rate)
+        except (ValueError, TypeError) as e:
+            raise e.__class__(f'{self.refresh_rate} was not parsable in {self.name}: {e}')
+        _REGISTRY.add(self)
+
+    @property
+    def name(self) -> str:
+        """
+        :return: the [key] or if there is none the qualified name of the [callable]
+        """
+        if self.key:
+            return self.key
+        return f"{getattr(self.callable, '__module__', '')}.{getattr(self.callable, '__qualname__', self.callable)}"
 
     def __call__(self, *args, **kwargs):
         """
@@ -19,47 +340,418 @@ class CallableCache:
         :param kwargs:
         :return:
         """
-        if "_force_refresh" in kwargs.keys() and kwargs["_force_refresh"]:
-            kwargs.pop("_force_refresh")
-            self.cache = self.callable(*args, **kwargs)
-            self.last_updated = datetime.datetime.now()
-            return self.cache
-        if "_force_refresh" in kwargs.keys():
-            kwargs.pop("_force_refresh")
-        if isinstance(self.refresh_rate, str):
-            if self.refresh_rate.lower() == "never":
-                return self.cache
+        force_refresh: bool = kwargs.pop("_force_refresh", False) if kwargs else False
+        key: Hashable = make_key(args, kwargs)
+        entry: Optional[_CacheEntry] = self._entries.get(key)
+        if entry is not None and not force_refresh and time.monotonic() < entry.refresh_at:
             try:
-                now: datetime.datetime = datetime.datetime.now()
-                today: datetime.datetime = datetime.datetime(year=now.year, month=now.month, day=now.day)
-                hour: int = int(self.refresh_rate.split(":")[0])
-                minute: int = int(self.refresh_rate.split(":")[1])
-                update_date: datetime.datetime = datetime.datetime(year=now.year, month=now.month, day=now.day,
-                                                                   hour=hour, minute=minute)
-                if not self.last_updated or (self.last_updated < today and update_date < now):
-                    self.cache = self.callable(*args, **kwargs)
-                    self.last_updated = datetime.datetime.now()
-                return self.cache
-            except ValueError as e:
-                raise e.__class__(f'{self.refresh_rate} was not parsable in {self.key if self.key else str(self)}')
-
-        if self.last_updated and isinstance(self.refresh_rate, int) \
-                and self.last_updated + datetime.timedelta(seconds=self.refresh_rate) > datetime.datetime.now():
-            return self.cache
-        self.cache = self.callable(*args, **kwargs)
-        self.last_updated = datetime.datetime.now()
-        return self.cache
-
-
-def callable_cache(refresh_rate: Union[str, int] = 10):
-    """
-    Caches the result of a function
+                self._entries.move_to_end(key)
+            except KeyError:
+                # evicted by another thread in the meantime
+                pass
+            # not locked, so it is an approximation under contention
+            self._hits += 1
+            return entry.value
+
+        with self._lock:
+            entry = self._entries.get(key)
+            flight: Optional[_Flight] = self._in_flight.get(key)
+            if not force_refresh and entry is not None:
+                now: float = time.monotonic()
+                if not entry.is_expired(now) or self.stale_while_revalidate or \
+                        (flight is not None and self.serve_stale):
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    if flight is None and entry.needs_refresh(now):
+                        self._schedule_refresh(key, args, kwargs)
+                    return entry.value
+            is_leader: bool = flight is None
+            if is_leader:
+                flight = self._in_flight[key] = _Flight()
+                if entry is None:
+                    self._misses += 1
+                else:
+                    self._refreshes += 1
+
+        if not is_leader:
+            return flight.wait()
+        return self._compute(key, flight, args, kwargs, from_store=entry is None and not force_refresh)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """
+        Drops all cached entries, including their counterparts in the [store]
+        """
+        with self._lock:
+            keys: List[Hashable] = list(self._entries.keys())
+            self._entries.clear()
+        for key in keys:
+            self._delete_persisted(key)
+
+    def invalidate(self, *args, **kwargs) -> bool:
+        """
+        Drops the cached entry of the given arguments, including its counterpart in the [store]
+        :return: if there was such an entry in memory
+        """
+        key: Hashable = make_key(args, kwargs)
+        with self._lock:
+            entry: Optional[_CacheEntry] = self._entries.pop(key, None)
+        self._delete_persisted(key)
+        return entry is not None
+
+    def get_stats(self) -> CacheStats:
+        """
+        :return: a snapshot of the statistics of this cache
+        """
+        with self._lock:
+            # copied in one call, as the lock free hits reorder the entries meanwhile
+            entries: List[_CacheEntry] = list(self._entries.values())
+            counters: Dict[str, Any] = dict(
+                hits=self._hits,
+                misses=self._misses,
+                refreshes=self._refreshes,
+                evictions=self._evictions,
+                store_hits=self._store_hits,
+                average_compute_secs=self._compute_secs / self._computations if self._computations else 0.0
+            )
+        # walking the values can take a while, so it is done without blocking the cache
+        values: List[Any] = [entry.value for entry in entries]
+        return CacheStats(name=self.name, size=len(values), bytes=get_deep_size(values), **counters)
+
+    def _compute(self, key: Hashable, flight: _Flight, args: Tuple[Any, ...], kwargs: Dict[str, Any],
+                 from_store: bool = False) -> Any:
+        try:
+            entry: Optional[_CacheEntry] = self._load(key) if from_store else None
+            if entry is None:
+                start: float = time.perf_counter()
+                value: Any = self.callable(*args, **kwargs)
+                with self._lock:
+                    self._computations += 1
+                    self._compute_secs += time.perf_counter() - start
+                    entry = self._store(key, value, self._get_expiry())
+                self._persist(key, entry)
+            flight.value = entry.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.done.set()
+        return flight.value
+
+    def _get_persistent_key(self, key: Hashable) -> str:
+        """
+        :return: the key of an entry in the [store], which is the same across processes
+        """
+        return f"{self.name}:{hashlib.sha1(repr(key).encode()).hexdigest()}"
+
+    def _load(self, key: Hashable) -> Optional[_CacheEntry]:
+        if self.store is None:
+            return None
+        try:
+            stored: Optional[Tuple[Any, Optional[float]]] = self.store.load(self._get_persistent_key(key))
+        except Exception as e:
+            LOGGER.warning(f'Could not load {self.name} from {self.store}: '
+                           f'{e.__class__.__name__}: {e}')
+            return None
+        if stored is None:
+            return None
+        value, expires_at = stored
+        if expires_at is None:
+            expires_at = math.inf
+        elif expires_at <= time.time():
+            return None
+        with self._lock:
+            self._store_hits += 1
+            return self._store(key, value, time.monotonic() + expires_at - time.time())
+
+    def _persist(self, key: Hashable, entry: _CacheEntry) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.store(self._get_persistent_key(key), entry.value,
+                             time.time() + entry.expires_at - time.monotonic()
+                             if entry.expires_at != math.inf else None)
+        except Exception as e:
+            LOGGER.warning(f'Could not persist {self.name} to {self.store}: '
+                           f'{e.__class__.__name__}: {e}')
+
+    def _delete_persisted(self, key: Hashable) -> None:
+        if self.store is None:
+            return
+        try:
+            self.store.delete(self._get_persistent_key(key))
+        except Exception as e:
+            LOGGER.warning(f'Could not delete {self.name} from {self.store}: {e.__class__.__name__}: {e}')
+
+    def _schedule_refresh(self, key: Hashable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> None:
+        """
+        Refreshes [key] on the background worker pool. Has to be called while holding the lock
+        """
+        flight: _Flight = _Flight()
+        self._in_flight[key] = flight
+        self._refreshes += 1
+        _get_refresh_executor().submit(self._revalidate, key, flight, args, kwargs)
+
+    def _revalidate(self, key: Hashable, flight: _Flight, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> None:
+        try:
+            self._compute(key, flight, args, kwargs)
+        except Exception as e:
+            LOGGER.warning(f'Background refresh of {self.name} failed with '
+                           f'{e.__class__.__name__}: {e}. Serving the last value')
+            with self._lock:
+                entry: Optional[_CacheEntry] = self._entries.get(key)
+                if entry is not None:
+                    entry.refresh_at = self._get_retry_at(entry)
+
+    def _get_retry_at(self, entry: _CacheEntry) -> float:
+        """
+        :return: when a failed refresh of [entry] is retried. Past its expiry only with [stale_while_revalidate],
+                 otherwise the expired value would keep being served
+        """
+        retry_at: float = time.monotonic() + self.retry_after
+        if self.stale_while_revalidate:
+            return retry_at
+        return min(retry_at, entry.expires_at)
+
+    def _store(self, key: Hashable, value: Any, expires_at: float) -> _CacheEntry:
+        refresh_at: float = expires_at
+        if self.refresh_ahead and expires_at != math.inf:
+            refresh_at = expires_at - (expires_at - time.monotonic()) * self.refresh_ahead
+        entry: _CacheEntry = _CacheEntry(value=value, expires_at=expires_at, refresh_at=refresh_at)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return entry
+
+    def _get_expiry(self) -> float:
+        """
+        :return: the monotonic deadline of a value stored now
+        """
+        expires_at: float = time.monotonic() + self._schedule.get_ttl()
+        if self.jitter:
+            expires_at += random.uniform(0, self.jitter)
+        return expires_at
+
+
+@dataclass(eq=False)
+class AsyncCallableCache(CallableCache):
+    """
+    A `CallableCache` for coroutine functions: it caches the awaited results, not the coroutines.
+
+    Expiry, eviction, refresh and store options behave the same.
+    Concurrent awaiters of a key share one in-flight task, background refreshes run as tasks on the running loop
+    and the [store] is accessed on the default executor, so it does not block the loop.
+    """
+    _tasks: Dict[Hashable, "asyncio.Task"] = field(default_factory=dict, init=False, repr=False)
+
+    async def __call__(self, *args, **kwargs):
+        """
+        If "_force_refresh=True" in kwargs, it will force a refresh
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        force_refresh: bool = kwargs.pop("_force_refresh", False) if kwargs else False
+        key: Hashable = make_key(args, kwargs)
+        entry: Optional[_CacheEntry] = self._entries.get(key)
+        if entry is not None and not force_refresh and time.monotonic() < entry.refresh_at:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                pass
+            self._hits += 1
+            return entry.value
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._entries.get(key)
+            task: Optional[asyncio.Task] = self._tasks.get(key)
+            if task is not None and task.get_loop() is not loop:
+                # tasks can only be shared within one loop
+                task = None
+            if not force_refresh and entry is not None:
+                now: float = time.monotonic()
+                if not entry.is_expired(now) or self.stale_while_revalidate or \
+                        (task is not None and self.serve_stale):
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    if task is None and entry.needs_refresh(now):
+                        self._refreshes += 1
+                        self._tasks[key] = loop.create_task(self._revalidate_async(key, args, kwargs))
+                    return entry.value
+            if task is None:
+                if entry is None:
+                    self._misses += 1
+                else:
+                    self._refreshes += 1
+                task = self._tasks[key] = loop.create_task(
+                    self._compute_async(key, args, kwargs, from_store=entry is None and not force_refresh))
+        # a cancelled awaiter must not cancel the computation the others wait for
+        return await asyncio.shield(task)
+
+    async def _compute_async(self, key: Hashable, args: Tuple[Any, ...], kwargs: Dict[str, Any],
+                             from_store: bool = False) -> Any:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        try:
+            entry: Optional[_CacheEntry] = None
+            if from_store and self.store is not None:
+                entry = await loop.run_in_executor(None, self._load, key)
+            if entry is None:
+                start: float = time.perf_counter()
+                value: Any = await self.callable(*args, **kwargs)
+                with self._lock:
+                    self._computations += 1
+                    self._compute_secs += time.perf_counter() - start
+                    entry = self._store(key, value, self._get_expiry())
+                if self.store is not None:
+                    loop.run_in_executor(None, self._persist, key, entry)
+            return entry.value
+        finally:
+            with self._lock:
+                if self._tasks.get(key) is asyncio.current_task():
+                    self._tasks.pop(key)
+
+    async def _revalidate_async(self, key: Hashable, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+        try:
+            return await self._compute_async(key, args, kwargs)
+        except Exception as e:
+            LOGGER.warning(f'Background refresh of {self.name} failed with '
+                           f'{e.__class__.__name__}: {e}. Serving the last value')
+            with self._lock:
+                entry: Optional[_CacheEntry] = self._entries.get(key)
+                if entry is None:
+                    raise
+                entry.refresh_at = self._get_retry_at(entry)
+                return entry.value
+
+
+def get_caches(prefix: Optional[str] = None) -> List[CallableCache]:
+    """
+    :param prefix: if provided, only caches whose name starts with it are returned
+    :return: all live caches, including the ones `callable_cache` creates per instance
+    """
+    return [cache for cache in list(_REGISTRY) if prefix is None or cache.name.startswith(prefix)]
+
+
+def get_cache_stats(prefix: Optional[str] = None) -> List[CacheStats]:
+    """
+    :param prefix: if provided, only caches whose name starts with it are included
+    :return: a snapshot of the statistics of all live caches
+    """
+    return [cache.get_stats() for cache in get_caches(prefix)]
+
+
+def invalidate_caches(func: Optional[Callable] = None, prefix: Optional[str] = None) -> int:
+    """
+    Clears all live caches of [func] or whose name starts with [prefix]
+
+    ```python
+    invalidate_caches(Repository.get_report)  # the caches of all Repository instances
+    invalidate_caches(prefix="myapp.repository.")
+    ```
+    :param func: the cached function or method
+    :param prefix: the prefix of the cache names, which are the qualified names of the cached functions by default
+    :return: how many caches were cleared
+    """
+    if func is None and prefix is None:
+        raise ValueError("Either func or prefix has to be provided")
+    func_name: Optional[str] = f"{func.__module__}.{func.__qualname__}" if func is not None else None
+    caches: List[CallableCache] = [
+        cache for cache in get_caches(prefix)
+        if func is None or cache.name == func_name or getattr(cache.callable, "func", cache.callable) is func
+    ]
+    for cache in caches:
+        cache.clear()
+    return len(caches)
+
+
+class _WeakBoundMethod:
+    """
+    Calls [func] with an instance as first argument, without keeping the instance alive.
+    So instance -> cache -> callable -> instance is no reference cycle and the instance is freed, as soon as its
+    last reference is gone, instead of waiting for the garbage collector
+    """
+    __slots__ = ("func", "_instance")
+
+    def __init__(self, func: Callable[..., Any], instance: Any):
+        self.func: Callable[..., Any] = func
+        self._instance: weakref.ref = weakref.ref(instance)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        instance: Any = self._instance()
+        if instance is None:
+            raise ReferenceError(f"The instance of {self.func.__qualname__} does not exist anymore")
+        return self.func(instance, *args, **kwargs)
+
+
+def callable_cache(refresh_rate: Union[str, int] = 10, maxsize: Optional[int] = 128, serve_stale: bool = False,
+                   stale_while_revalidate: bool = False, refresh_ahead: float = 0.0, jitter: float = 0.0,
+                   store: Optional["CacheStore"] = None):
+    """
+    Caches the result of a method per instance and argument combination.
+    Coroutine methods are supported as well, their awaited results are cached (see `AsyncCallableCache`)
     :param refresh_rate: determines how long a result is cached
+    :param maxsize: how many argument combinations are cached per instance, None for unbounded
+    :param serve_stale: if concurrent callers get the expired value while another thread refreshes it
+    :param stale_while_revalidate: if expired values are returned immediately and refreshed in the background
+    :param refresh_ahead: fraction of the refresh_rate before the expiry, in which a background refresh is started
+    :param jitter: up to how many random seconds are added to each expiry
+    :param store: an optional persistent second tier, shared by all instances.
+    Its entries are keyed by the qualified name of the method and the arguments, not by the instance
     If "_force_refresh=True" in kwargs, it will force a refresh
     :return:
     """
 
     def decorator(func: Callable[[List[Any], List[Any]], Any]):
+        cache_class: type = AsyncCallableCache if inspect.iscoroutinefunction(func) else CallableCache
+
+        def get_cache(self) -> CallableCache:
+            caches: Optional[Dict[Callable, CallableCache]] = getattr(self, "_query_function_dict", None)
+            cache: Optional[CallableCache] = caches.get(func) if caches else None
+            if cache is None:
+                with _CACHE_CREATION_LOCK:
+                    if not hasattr(self, "_query_function_dict") or not self._query_function_dict:
+                        self._query_function_dict = {}
+                    if func not in self._query_function_dict.keys():
+                        try:
+                            bound: Callable[..., Any] = _WeakBoundMethod(func, self)
+                        except TypeError:
+                            # e.g. a class with __slots__ without __weakref__
+                            bound = functools.partial(func, self)
+                        self._query_function_dict[func] = cache_class(
+                            refresh_rate=refresh_rate,
+                            key=f"{func.__module__}.{func.__qualname__}",
+                            callable=bound,
+                            maxsize=maxsize,
+                            serve_stale=serve_stale,
+                            stale_while_revalidate=stale_while_revalidate,
+                            refresh_ahead=refresh_ahead,
+                            jitter=jitter,
+                            store=store
+                        )
+                    cache = self._query_function_dict[func]
+            return cache
+
+        if cache_class is AsyncCallableCache:
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                """
+                If "_force_refresh=True" in kwargs, it will force a refresh
+                :param args:
+                :param kwargs:
+                :return:
+                """
+                return await get_cache(args[0])(*args[1:], **kwargs)
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             """
@@ -68,16 +760,7 @@ def callable_cache(refresh_rate: Union[str, int] = 10):
             :param kwargs:
             :return:
             """
-            self = args[0]
-            if not hasattr(self, "_query_function_dict") or not self._query_function_dict:
-                self._query_function_dict = {}
-            if func not in self._query_function_dict.keys():
-                self._query_function_dict[func] = CallableCache(
-                    refresh_rate=refresh_rate,
-                    key=func.__name__,
-                    callable=func
-                )
-            return self._query_function_dict[func](*args, **kwargs)
+            return get_cache(args[0])(*args[1:], **kwargs)
 
         return wrapper
 
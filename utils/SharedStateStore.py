@@ -0,0 +1,172 @@
+############### requirements ###############
+#
+# sqlalchemy
+#
+# .filehandler
+# .SqliteController
+#
+############################################
+import logging
+import os
+import pickle
+import threading
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .SqliteController import SqliteController, _sessioning
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# the state name, its value, the settings it was created with or None and the sequence number of the change
+SharedRecord = Tuple[str, Any, Optional[Tuple], int]
+
+
+class SharedStateStore(SqliteController):
+    """
+    Shares the states of the `StateManager`s of several processes on the same host through a sqlite file.
+
+    Every process keeps all states in memory, so `get_state` never leaves the process.
+    Each change is written to the file with an increasing sequence number and a thread of every process polls
+    for the changes of the others every [poll_interval] seconds, applies them and notifies its subscribers.
+    A polled change only replaces a value, if it is newer than the one the process already has.
+
+    ```python
+    StateManager().share(SharedStateStore("states.db"))
+    ```
+    """
+    poll_interval: float
+    _table_name: str
+    _is_table_created: bool = False
+
+    def __init__(self, db_file: str, poll_interval: float = 0.05, table_name: str = "shared_states",
+                 timeout: int = 60):
+        super().__init__(db_file, timeout=timeout)
+        self.poll_interval = poll_interval
+        self._table_name = table_name
+        # identifies the writes of this store, so it does not apply its own changes again
+        self._origin: str = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self._last_sequence: int = 0
+        # the sequence number of the latest value per state name this process has
+        self._sequences: Dict[str, int] = {}
+        self._lock: threading.Lock = threading.Lock()
+        self._stopped: threading.Event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._db_file}, {self._table_name})"
+
+    def restore(self) -> Dict[str, Tuple[Any, Optional[Tuple]]]:
+        """
+        :return: the current value and the creation settings per state name
+        """
+        self._create_table()
+        states: Dict[str, Tuple[Any, Optional[Tuple]]] = {}
+        for state_name, value, settings, sequence in self._select_changes(0):
+            states[state_name] = (value, settings)
+            self.claim(state_name, sequence)
+        return states
+
+    def append(self, records: List[Tuple[str, Any, Optional[Tuple]]]) -> bool:
+        """
+        Writes the changes of this process. Has to be called under the locks of the states of [records]
+        :return: False, it is never due for a snapshot like a `StateJournal`
+        """
+        self._create_table()
+        sequences: Dict[str, int] = self._write([(state_name, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                                                  pickle.dumps(settings) if settings is not None else None)
+                                                 for state_name, value, settings in records])
+        for state_name, sequence in sequences.items():
+            self.claim(state_name, sequence)
+        return False
+
+    def claim(self, state_name: str, sequence: int) -> bool:
+        """
+        Has to be called under the lock of the state before applying a change
+        :return: if the change with [sequence] is newer than the value this process has of [state_name]
+        """
+        with self._lock:
+            if sequence <= self._sequences.get(state_name, 0):
+                return False
+            self._sequences[state_name] = sequence
+            return True
+
+    def start(self, on_changes: Callable[[List[SharedRecord]], None]) -> None:
+        """
+        Starts polling for the changes of other processes
+        :param on_changes: called with the changes in the order they were made
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._poll, args=(on_changes,), name="SharedStateStore-poll",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def get_changes(self) -> List[SharedRecord]:
+        """
+        :return: the changes other processes made since the last call
+        """
+        self._create_table()
+        return self._select_changes(self._last_sequence, exclude_origin=self._origin)
+
+    def _poll(self, on_changes: Callable[[List[SharedRecord]], None]) -> None:
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                records: List[SharedRecord] = self.get_changes()
+                if records:
+                    on_changes(records)
+            except Exception as e:
+                LOGGER.warning(f'Could not apply the changes of {self}: {e.__class__.__name__}: {e}')
+
+    def _create_table(self):
+        if self._is_table_created:
+            return
+        self._set_wal_mode()
+        self.create_table(self._table_name, ["name TEXT PRIMARY KEY", "value BLOB", "settings BLOB",
+                                             "sequence INTEGER", "origin TEXT"])
+        self._create_index()
+        self._is_table_created = True
+
+    @_sessioning()
+    def _set_wal_mode(self, _session: Session = None):
+        # readers do not block the writer and the other way around
+        _session.execute(text("PRAGMA journal_mode=WAL"))
+        _session.commit()
+
+    @_sessioning()
+    def _create_index(self, _session: Session = None):
+        _session.execute(text(f"CREATE INDEX IF NOT EXISTS {self._table_name}_sequence "
+                              f"ON {self._table_name} (sequence)"))
+        _session.commit()
+
+    @_sessioning()
+    def _write(self, rows: List[Tuple[str, bytes, Optional[bytes]]], _session: Session = None) -> Dict[str, int]:
+        sequences: Dict[str, int] = {}
+        for state_name, value, settings in rows:
+            _session.execute(text(f"INSERT INTO {self._table_name} (name, value, settings, sequence, origin) "
+                                  f"VALUES (:name, :value, :settings, "
+                                  f"(SELECT COALESCE(MAX(sequence), 0) + 1 FROM {self._table_name}), :origin) "
+                                  f"ON CONFLICT (name) DO UPDATE SET value = excluded.value, "
+                                  f"settings = COALESCE(excluded.settings, settings), "
+                                  f"sequence = excluded.sequence, origin = excluded.origin"),
+                             {"name": state_name, "value": value, "settings": settings, "origin": self._origin})
+            sequences[state_name] = _session.execute(text(f"SELECT sequence FROM {self._table_name} "
+                                                          f"WHERE name = :name"), {"name": state_name}).scalar()
+        _session.commit()
+        return sequences
+
+    @_sessioning()
+    def _select_changes(self, after: int, exclude_origin: Optional[str] = None,
+                        _session: Session = None) -> List[SharedRecord]:
+        rows = _session.execute(text(f"SELECT name, value, settings, sequence, origin FROM {self._table_name} "
+                                     f"WHERE sequence > :after ORDER BY sequence"), {"after": after}).fetchall()
+        if rows:
+            self._last_sequence = max(self._last_sequence, rows[-1][3])
+        return [(state_name, pickle.loads(value), pickle.loads(settings) if settings is not None else None, sequence)
+                for state_name, value, settings, sequence, origin in rows if origin != exclude_origin]
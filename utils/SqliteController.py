@@ -1,51 +1,170 @@
 ############### requirements ###############
 #
 # sqlalchemy
+# numpy
+# pandas
 #
 # .filehandler
 #
 ############################################
 import functools
+import itertools
+import logging
+import os
 import sqlite3
-from typing import Callable, Any, List, Tuple, Union, Dict, Optional, Set, KeysView
+import threading
+from contextlib import contextmanager
+from typing import Callable, Any, List, Tuple, Union, Dict, Optional, Set, KeysView, Iterator, Iterable
 
-from sqlalchemy import text
+import numpy as np
+from pandas import DataFrame
+from sqlalchemy import text, event
 from sqlalchemy.engine import Engine, create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from .filehandler import to_abs_file_path
 
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# one engine, and therefore one connection pool, and one session factory per database file and process
+_ENGINES: Dict[str, Tuple[Engine, sessionmaker]] = {}
+# the timeout, pool size, max overflow and profile each engine was created with
+_ENGINE_SETTINGS: Dict[str, Tuple[Any, ...]] = {}
+# the ignored settings that were already warned about, as the string of the path and the settings
+_WARNED_SETTINGS: Set[str] = set()
+_ENGINES_LOCK: threading.Lock = threading.Lock()
+# pooled connections must not be used by a forked child process
+_engines_pid: int = os.getpid()
+
+# the pragmas set on every connection of a profile
+PRAGMA_PROFILES: Dict[str, Dict[str, Any]] = {
+    # readers do not block the writer, every commit is synced to disk
+    "durable": {"journal_mode": "WAL", "synchronous": "FULL", "cache_size": -16_000, "temp_store": "DEFAULT"},
+    # commits are not synced, a crash of the machine (not the process) can lose the latest transactions
+    "fast-ingest": {"journal_mode": "WAL", "synchronous": "OFF", "cache_size": -64_000, "temp_store": "MEMORY"},
+    # the database file is memory mapped, WAL commits are synced at checkpoints only
+    "read-heavy": {"journal_mode": "WAL", "synchronous": "NORMAL", "mmap_size": 268_435_456, "cache_size": -64_000,
+                   "temp_store": "MEMORY"},
+}
+
+
+def _get_dtype(declared_type: str) -> Optional[np.dtype]:
+    """
+    :return: the numpy dtype of a column by the affinity rules of sqlite for its [declared_type].
+             None for columns without a type, their dtype depends on the values
+    """
+    declared_type = declared_type.upper()
+    if "INT" in declared_type:
+        return np.dtype(np.int64)
+    if any(name in declared_type for name in ("CHAR", "CLOB", "TEXT", "BLOB")):
+        return np.dtype(object)
+    if not declared_type:
+        return None
+    # REAL and NUMERIC affinity
+    return np.dtype(np.float64)
+
+
+def _set_pragmas(pragmas: Dict[str, Any]) -> Callable[[sqlite3.Connection, Any], None]:
+    """
+    :return: a listener for the "connect" event of an engine, which sets the [pragmas] on each new connection
+    """
+    statements: List[str] = [f"PRAGMA {name} = {value}" for name, value in pragmas.items()]
+
+    def on_connect(dbapi_connection: sqlite3.Connection, _) -> None:
+        cursor: sqlite3.Cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return on_connect
+
+
+def _get_engine(db_path: str, timeout: int, pool_size: int, max_overflow: int, warm_connections: int,
+                profile: Union[str, Dict[str, Any], None] = None) -> Tuple[Engine, sessionmaker]:
+    """
+    :return: the engine and the session factory of [db_path]. They are created on first usage,
+             the settings of later calls for the same [db_path] are ignored with a warning, if they differ
+    """
+    global _engines_pid
+    settings: Tuple[Any, ...] = (timeout, pool_size, max_overflow, profile)
+    registered: Optional[Tuple[Engine, sessionmaker]] = _ENGINES.get(db_path)
+    if registered is not None and _engines_pid == os.getpid():
+        if _ENGINE_SETTINGS.get(db_path) != settings:
+            _warn_ignored_settings(db_path, settings)
+        return registered
+    with _ENGINES_LOCK:
+        if _engines_pid != os.getpid():
+            # leaves the connections of the parent process alone
+            _ENGINES.clear()
+            _ENGINE_SETTINGS.clear()
+            _engines_pid = os.getpid()
+        registered = _ENGINES.get(db_path)
+        if registered is not None:
+            if _ENGINE_SETTINGS.get(db_path) != settings:
+                _warn_ignored_settings(db_path, settings)
+            return registered
+        engine: Engine = create_engine(f'sqlite:////{db_path}', connect_args={'timeout': timeout,
+                                                                                 'check_same_thread': False},
+                                       pool_size=pool_size, max_overflow=max_overflow)
+        pragmas: Dict[str, Any] = PRAGMA_PROFILES[profile] if isinstance(profile, str) else profile or {}
+        if pragmas:
+            event.listen(engine, "connect", _set_pragmas(pragmas))
+        # opens the connections once, so the first queries do not pay for it
+        connections = [engine.connect() for _ in range(min(warm_connections, pool_size))]
+        for connection in connections:
+            connection.close()
+        registered = _ENGINES[db_path] = (engine, sessionmaker(bind=engine))
+        _ENGINE_SETTINGS[db_path] = settings
+        LOGGER.debug(f"Created the engine of {db_path} with a pool of {pool_size} connections "
+                     f"and the pragmas {pragmas}")
+        return registered
+
+
+def _warn_ignored_settings(db_path: str, settings: Tuple[Any, ...]) -> None:
+    """
+    Warns once per [db_path] and [settings], that they differ from the ones its engine was created with
+    """
+    key: str = f"{db_path} {settings}"
+    if key in _WARNED_SETTINGS:
+        return
+    _WARNED_SETTINGS.add(key)
+    LOGGER.warning(f"The engine of {db_path} was created with the timeout, pool size, max overflow and profile "
+                   f"{_ENGINE_SETTINGS.get(db_path)}, the requested {settings} are ignored. "
+                   f"Create the controller with the settings first or call dispose_engines()")
+
+
+def dispose_engines() -> None:
+    """
+    Closes the pooled connections of all database files, e.g. after a fork
+    """
+    with _ENGINES_LOCK:
+        for engine, _ in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
+        _ENGINE_SETTINGS.clear()
+        _WARNED_SETTINGS.clear()
+
 
 def _sessioning():
     """
     Dont forget the brackets "()" at the end of the decorator!!
 
     this method injects a "_session" parameter in the function call, which represents a sqlalchemy.orm.Session to work on.
-    This session is "closed" after usage, so that every function has its own clean session. Its not really closed, just
-    marked as available in the connection pool.
-    Therefore it injects in the class a sqlalchemy.orm.sessionmaker which represents a connection pool.
+    This session is closed after usage, so that every function has its own clean session and its connection goes back
+    to the pool of the database file, which is shared by all controllers of the process.
 
-    Best is to dont try to understand this function in detail.
-    Because of multiple inheritance it kinda works with reflection. Actually it is really not that complicated,
-    it just took a while to figure it out.
     :return: a wrapper which injects a "_session": sqlalchemy.orm.Session as kwarg
     """
 
-    def _get_engine(self) -> Engine:
-        if not hasattr(self, "_engine"):
-            setattr(self, "_engine", self._get_engine())
-        return self._engine
-
     def _sessioning(func: Callable[[List[Any], List[Any]], Any]):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             self = args[0]
-            _engine = _get_engine(self)
-            _session: Session = sessionmaker(_engine)()
-            kwargs["_session"] = _session
-            result: Any = func(*args, **kwargs)
-            _session.connection().close()
-            return result
+            with self.session() as _session:
+                kwargs["_session"] = _session
+                return func(*args, **kwargs)
 
         return wrapper
 
@@ -53,20 +172,69 @@ def _sessioning():
 
 
 class SqliteController:
+    """
+    All controllers of the same database file in a process share one engine with a pool of connections.
+    The pool settings and the profile of the first controller of a file are used,
+    a later controller with different ones logs a warning.
+    """
     _timeout: int
     _db_file: str
+    _pool_size: int
+    _max_overflow: int
+    _warm_connections: int
+    _profile: Union[str, Dict[str, Any], None]
 
-    _engine: Engine
+    _db_path: Optional[str] = None
     _sqlite_connection: sqlite3.Connection
     _sqlite_cursor: sqlite3.Cursor
 
-    def __init__(self, db_file: str, timeout: int = 60):
+    def __init__(self, db_file: str, timeout: int = 60, pool_size: int = 5, max_overflow: int = 10,
+                 warm_connections: int = 1, profile: Union[str, Dict[str, Any], None] = None):
+        """
+        :param db_file: the database file relative to the project root
+        :param timeout: the seconds to wait for a lock of the database
+        :param pool_size: how many connections are kept open
+        :param max_overflow: how many connections are opened additionally under load
+        :param warm_connections: how many connections are opened right away
+        :param profile: the pragmas set on every connection, either the name of one of the [PRAGMA_PROFILES]
+                        "durable", "fast-ingest" and "read-heavy" or a dict of pragma names and values.
+                        If None, sqlite's defaults are kept (rollback journal, readers block the writer)
+        """
+        if isinstance(profile, str) and profile not in PRAGMA_PROFILES:
+            raise ValueError(f'Unknown profile "{profile}", expected one of {list(PRAGMA_PROFILES.keys())}')
         self._timeout = timeout
         self._db_file = db_file
+        self._pool_size = pool_size
+        self._max_overflow = max_overflow
+        self._warm_connections = warm_connections
+        self._profile = profile
+
+    def _get_engine(self) -> Tuple[Engine, sessionmaker]:
+        """
+        :return: the engine and the session factory shared by all controllers of the database file
+        """
+        if self._db_path is None:
+            self._db_path = to_abs_file_path(self._db_file)
+        return _get_engine(self._db_path, self._timeout, self._pool_size, self._max_overflow, self._warm_connections,
+                           self._profile)
+
+    @contextmanager
+    def session(self) -> Iterator[Session]:
+        """
+        A session with a connection of the pool, which is closed afterwards.
+        Uncommitted changes are rolled back.
 
-    def _get_engine(self) -> Engine:
-        return create_engine(f'sqlite:////{to_abs_file_path(self._db_file)}',
-                             connect_args={'timeout': self._timeout})
+        ```python
+        with controller.session() as session:
+            session.execute(text("DELETE FROM my_table"))
+            session.commit()
+        ```
+        """
+        session: Session = self._get_engine()[1]()
+        try:
+            yield session
+        finally:
+            session.close()
 
     @_sessioning()
     def create_table(self, table_name: str, columns: List[str], _session: Session = None):
@@ -80,26 +248,73 @@ class SqliteController:
         SqliteController("my.db").create_table("my_table", ["id int primary key", "name text", "age integer"])
         ```
         """
-        _session.execute(f"""CREATE TABLE IF NOT EXISTS {table_name} ({','.join(columns)})""")
+        _session.execute(text(f"""CREATE TABLE IF NOT EXISTS {table_name} ({','.join(columns)})"""))
         _session.commit()
 
     @_sessioning()
-    def insert(self, table_name: str, entries: List[Dict[str, Any]] = None, _session: Session = None):
+    def insert(self, table_name: str, entries: Iterable[Dict[str, Any]] = None, chunk_size: int = 10_000,
+               on_conflict: Optional[str] = None, conflict_columns: List[str] = None, _session: Session = None) -> int:
         """
+        Inserts the [entries] in chunks of [chunk_size] rows with one prepared statement, each chunk in one transaction.
+        So there is no limit on the number of rows and [entries] can be a generator.
+
+        ```python
+        controller.insert("measurements", ({"id": i, "value": read(i)} for i in range(10_000_000)))
+        controller.insert("users", users, on_conflict="update", conflict_columns=["id"])
+        ```
+
         :param table_name: the table to insert into
         :param entries: every entry represents a row to insert, with the keys representing the column names and the
-        values the corresponding value to insert
+        values the corresponding value to insert. All entries need the keys of the first one
+        :param chunk_size: how many rows are inserted per transaction
+        :param on_conflict: what happens if a row violates a unique constraint:
+                            None fails, "ignore" skips the row, "replace" deletes the existing row before inserting,
+                            "update" updates the columns of the existing row
+        :param conflict_columns: the unique columns for "update"
         :param _session: the session gets injected
-        :return:
+        :return: the number of inserted or updated rows
         """
-        vals: List[Any] = []
-        query = f'INSERT INTO {table_name} ({",".join(entries[0].keys())}) VALUES '
-        for entry in entries:
-            query += f'({",".join(["?" for i in range(len(entry.values()))])}),'
-            vals.extend(entry.values())
-        query = query[:-1]
-        _session.bind.execute(query, vals)
-        _session.commit()
+        iterator: Iterator[Dict[str, Any]] = iter(entries or [])
+        first_entry: Optional[Dict[str, Any]] = next(iterator, None)
+        if first_entry is None:
+            return 0
+        columns: List[str] = list(first_entry.keys())
+        query: str = self._get_insert_query(table_name, columns, on_conflict, conflict_columns)
+
+        rows: Iterator[Tuple[Any, ...]] = (tuple(entry[column] for column in columns)
+                                           for entry in itertools.chain([first_entry], iterator))
+        count: int = 0
+        while True:
+            chunk: List[Tuple[Any, ...]] = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return count
+            # the connection of the session's transaction, it is released on every commit.
+            # The statement stays the same, so sqlite3 prepares it once and caches it
+            cursor: sqlite3.Cursor = _session.connection().connection.cursor()
+            try:
+                cursor.executemany(query, chunk)
+                count += cursor.rowcount
+            finally:
+                cursor.close()
+            _session.commit()
+
+    @staticmethod
+    def _get_insert_query(table_name: str, columns: List[str], on_conflict: Optional[str] = None,
+                          conflict_columns: List[str] = None) -> str:
+        placeholders: str = ",".join("?" for _ in columns)
+        if on_conflict is None:
+            return f'INSERT INTO {table_name} ({",".join(columns)}) VALUES ({placeholders})'
+        if on_conflict in ("ignore", "replace"):
+            return f'INSERT OR {on_conflict.upper()} INTO {table_name} ({",".join(columns)}) VALUES ({placeholders})'
+        if on_conflict == "update":
+            if not conflict_columns:
+                raise ValueError('on_conflict="update" needs the conflict_columns')
+            updated_columns: List[str] = [column for column in columns if column not in conflict_columns]
+            action: str = f'UPDATE SET {",".join(f"{column} = excluded.{column}" for column in updated_columns)}' \
+                if updated_columns else "NOTHING"
+            return f'INSERT INTO {table_name} ({",".join(columns)}) VALUES ({placeholders}) ' \
+                   f'ON CONFLICT ({",".join(conflict_columns)}) DO {action}'
+        raise ValueError(f'Unknown on_conflict "{on_conflict}", expected "ignore", "replace" or "update"')
 
     @_sessioning()
     def update(self, table_name: str, entries: List[Dict[str, Any]],
@@ -114,12 +329,10 @@ class SqliteController:
         :param _session: get injected
         :return:
         """
-        parameters: Dict[str, str] = {}
-
         for entry in entries:
             params: Dict[str, Any] = {}
             query = f"UPDATE {table_name} SET "
-            for column, value in entry:
+            for column, value in entry.items():
                 query += f"{column} = :{column},"
                 params[column] = value
             query = query[:-1]
@@ -127,8 +340,111 @@ class SqliteController:
             if where:
                 query += f" WHERE {where}"
 
-            _session.execute(text(query), parameters)
-            _session.commit()
+            _session.execute(text(query), params)
+        _session.commit()
+
+    @_sessioning()
+    def bulk_update(self, table_name: str, key_columns: Union[str, List[str]], entries: Iterable[Dict[str, Any]],
+                    upsert: bool = False, staged: bool = False, chunk_size: int = 10_000,
+                    _session: Session = None) -> int:
+        """
+        Updates the rows identified by the [key_columns] of each entry with its other values,
+        all in one transaction, so either all or none are updated. [entries] can be a generator.
+
+        By default it runs one prepared `UPDATE ... WHERE key = ?` statement with executemany.
+        With [staged] the entries are inserted into a temporary table first and the rows are updated by one
+        set based `UPDATE ... FROM` statement (needs sqlite 3.33). This is much faster, if [key_columns] have no index,
+        as the table is scanned once instead of once per entry. For an indexed key both are about equally fast.
+
+        ```python
+        controller.bulk_update("users", "id", ({"id": user.id, "last_login": user.last_login} for user in users))
+        ```
+
+        :param table_name: the table to update
+        :param key_columns: the column or columns, that identify a row
+        :param entries: every entry represents a row, with the keys representing the column names and the
+        values the corresponding value. All entries need the keys of the first one, which contain the [key_columns]
+        :param upsert: if entries, whose key does not exist yet, are inserted. Needs a unique index on [key_columns]
+        :param staged: if the entries are staged in a temporary table
+        :param chunk_size: how many rows are passed to sqlite at once
+        :param _session: the session gets injected
+        :return: the number of updated or inserted rows
+        """
+        if isinstance(key_columns, str):
+            key_columns = [key_columns]
+        iterator: Iterator[Dict[str, Any]] = iter(entries)
+        first_entry: Optional[Dict[str, Any]] = next(iterator, None)
+        if first_entry is None:
+            return 0
+        columns: List[str] = list(first_entry.keys())
+        if not set(key_columns).issubset(columns):
+            raise ValueError(f"The entries have to contain the key columns {key_columns}")
+        updated_columns: List[str] = [column for column in columns if column not in key_columns]
+        if not updated_columns:
+            raise ValueError("The entries contain no columns to update")
+        if staged and sqlite3.sqlite_version_info < (3, 33):
+            LOGGER.debug(f"sqlite {sqlite3.sqlite_version} does not support UPDATE FROM, updating row by row")
+            staged = False
+
+        entries = itertools.chain([first_entry], iterator)
+        cursor: sqlite3.Cursor = _session.connection().connection.cursor()
+        try:
+            if staged:
+                count: int = self._update_staged(cursor, table_name, key_columns, columns, updated_columns, entries,
+                                                 upsert, chunk_size)
+            elif upsert:
+                count = self._executemany(cursor, self._get_insert_query(table_name, columns, "update", key_columns),
+                                          columns, entries, chunk_size)
+            else:
+                query: str = f'UPDATE {table_name} SET {",".join(f"{column} = ?" for column in updated_columns)} ' \
+                             f'WHERE {" AND ".join(f"{column} = ?" for column in key_columns)}'
+                count = self._executemany(cursor, query, updated_columns + key_columns, entries, chunk_size)
+        finally:
+            cursor.close()
+        _session.commit()
+        return count
+
+    def _update_staged(self, cursor: sqlite3.Cursor, table_name: str, key_columns: List[str], columns: List[str],
+                       updated_columns: List[str], entries: Iterable[Dict[str, Any]], upsert: bool,
+                       chunk_size: int) -> int:
+        staging_table: str = f"_staged_{table_name}"
+        # copies the column types, so the values are converted the same way
+        cursor.execute(f'DROP TABLE IF EXISTS temp.{staging_table}')
+        cursor.execute(f'CREATE TEMP TABLE {staging_table} AS SELECT {",".join(columns)} FROM {table_name} WHERE 0')
+        try:
+            self._executemany(cursor, f'INSERT INTO temp.{staging_table} ({",".join(columns)}) '
+                                      f'VALUES ({",".join("?" for _ in columns)})', columns, entries, chunk_size)
+            if upsert:
+                # "WHERE true" resolves the ambiguity of "ON CONFLICT" after a "SELECT"
+                cursor.execute(f'INSERT INTO {table_name} ({",".join(columns)}) '
+                               f'SELECT {",".join(columns)} FROM temp.{staging_table} WHERE true '
+                               f'ON CONFLICT ({",".join(key_columns)}) DO UPDATE SET '
+                               f'{",".join(f"{column} = excluded.{column}" for column in updated_columns)}')
+            else:
+                cursor.execute(f'UPDATE {table_name} SET '
+                               f'{",".join(f"{column} = staged.{column}" for column in updated_columns)} '
+                               f'FROM temp.{staging_table} AS staged WHERE '
+                               f'{" AND ".join(f"{table_name}.{column} = staged.{column}" for column in key_columns)}')
+            return cursor.rowcount
+        finally:
+            cursor.execute(f'DROP TABLE IF EXISTS temp.{staging_table}')
+
+    @staticmethod
+    def _executemany(cursor: sqlite3.Cursor, query: str, columns: List[str], entries: Iterable[Dict[str, Any]],
+                     chunk_size: int) -> int:
+        """
+        Runs [query] for all [entries] in chunks of [chunk_size], without committing
+        :param columns: the keys of the entries in the order of the placeholders of [query]
+        :return: the number of affected rows
+        """
+        rows: Iterator[Tuple[Any, ...]] = (tuple(entry[column] for column in columns) for entry in entries)
+        count: int = 0
+        while True:
+            chunk: List[Tuple[Any, ...]] = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return count
+            cursor.executemany(query, chunk)
+            count += cursor.rowcount
 
     @_sessioning()
     def select(self, table: str, keys: Dict[str, Any] = None, _session: Session = None) -> Optional[List[Any]]:
@@ -147,3 +463,245 @@ class SqliteController:
 
             return list(_session.execute(text(f"""SELECT * FROM {table} {where_str}"""), keys))
         return list(_session.execute(text(f"""SELECT * FROM {table}""")))
+
+    def iter_select(self, table: str, keys: Dict[str, Any] = None, columns: List[str] = None,
+                    order_by: Union[str, List[str]] = None, limit: Optional[int] = None,
+                    batch_size: int = 1000) -> Iterator[Any]:
+        """
+        Like `select`, but yields the rows while they are fetched, [batch_size] at a time,
+        so a table of any size is read in constant memory.
+        The session stays open until the iteration is finished or the generator is closed.
+
+        ```python
+        for row in controller.iter_select("measurements", columns=["id", "value"], order_by="id"):
+            ...
+        ```
+
+        its not the most secure, because [order_by] could be sql injected.
+        Be aware of that and dont let tainted input in there
+        :param table: the table to select from
+        :param keys: Dict where the key value is the column names to filter on and values are the corresponding
+        values you filter
+        :param columns: the columns to select, all if None
+        :param order_by: the ORDER BY clause, e.g. "id" or ["age DESC", "name"]
+        :param limit: the maximum number of rows
+        :param batch_size: how many rows are fetched at once
+        :return: a generator of the rows
+        """
+        query, params = self._get_select_query(table, keys, columns=columns, order_by=order_by, limit=limit)
+        with self.session() as session:
+            result = session.execute(text(query), params)
+            while True:
+                rows: List[Any] = result.fetchmany(batch_size)
+                if not rows:
+                    return
+                yield from rows
+
+    def select_page(self, table: str, key_columns: Union[str, List[str]], after: Any = None, page_size: int = 1000,
+                    keys: Dict[str, Any] = None, columns: List[str] = None) -> List[Any]:
+        """
+        Selects the next [page_size] rows ordered by the unique [key_columns], that come [after] the given key.
+        Unlike OFFSET this takes the same time for every page, given an index on [key_columns].
+
+        ```python
+        page = controller.select_page("measurements", "id")
+        while page:
+            ...
+            page = controller.select_page("measurements", "id", after=page[-1].id)
+        ```
+
+        :param table: the table to select from
+        :param key_columns: the column or columns, that identify a row
+        :param after: the key of the last row of the previous page, a tuple for several [key_columns].
+                      None for the first page
+        :param page_size: the number of rows per page
+        :param keys: Dict where the key value is the column names to filter on and values are the corresponding
+        values you filter
+        :param columns: the columns to select, all if None. They have to contain the [key_columns]
+        :return: the rows of the page, an empty list after the last one
+        """
+        if isinstance(key_columns, str):
+            key_columns = [key_columns]
+        if columns is not None and not set(key_columns).issubset(columns):
+            raise ValueError(f"The columns {columns} have to contain the key columns {key_columns}")
+        after_condition: Optional[Tuple[str, Dict[str, Any]]] = None
+        if after is not None:
+            after_values: Tuple[Any, ...] = after if isinstance(after, tuple) else (after,)
+            after_params: Dict[str, Any] = {f"_after_{i}": value for i, value in enumerate(after_values)}
+            after_condition = (f'({",".join(key_columns)}) > ({",".join(f":{param}" for param in after_params)})',
+                               after_params)
+        query, params = self._get_select_query(table, keys, columns=columns, order_by=key_columns, limit=page_size,
+                                               condition=after_condition)
+        return self._select_query(query, params)
+
+    def iter_pages(self, table: str, key_columns: Union[str, List[str]], page_size: int = 1000,
+                   keys: Dict[str, Any] = None, columns: List[str] = None) -> Iterator[List[Any]]:
+        """
+        Yields all rows page by page with `select_page`.
+        Each page is selected in its own short session, so the table is not kept locked between the pages.
+        :return: a generator of the pages
+        """
+        key_names: List[str] = [key_columns] if isinstance(key_columns, str) else key_columns
+        after: Any = None
+        while True:
+            page: List[Any] = self.select_page(table, key_names, after=after, page_size=page_size, keys=keys,
+                                               columns=columns)
+            if not page:
+                return
+            yield page
+            mapping = page[-1]._mapping
+            after = tuple(mapping[column] for column in key_names)
+
+    @_sessioning()
+    def select_arrays(self, table: str, keys: Dict[str, Any] = None, columns: List[str] = None,
+                      order_by: Union[str, List[str]] = None, limit: Optional[int] = None,
+                      dtypes: Dict[str, Any] = None, presize: Optional[bool] = None, batch_size: int = 10_000,
+                      _session: Session = None) -> Dict[str, np.ndarray]:
+        """
+        Selects the rows like `iter_select` into one numpy array per column.
+        The batches of the cursor are copied column by column into the arrays, without creating
+        a SQLAlchemy row or a dict per row.
+
+        INTEGER columns become int64 arrays, REAL and NUMERIC columns float64 and all others object arrays.
+        An INTEGER column with NULL or REAL values becomes float64 with NaN for NULL, like pandas does.
+
+        ```python
+        arrays = controller.select_arrays("measurements", columns=["id", "value"])
+        arrays["value"].mean()
+        ```
+
+        :param table: the table to select from
+        :param keys: Dict where the key value is the column names to filter on and values are the corresponding
+        values you filter
+        :param columns: the columns to select, all if None
+        :param order_by: the ORDER BY clause, e.g. "id" or ["age DESC", "name"]
+        :param limit: the maximum number of rows
+        :param dtypes: the dtypes of some columns, instead of the ones of their declared types
+        :param presize: if the rows are counted first, so the arrays are allocated once. The count stops at [limit].
+                        None counts them without [keys], as the fetch reads the whole table (or the first [limit]
+                        rows) anyway. Otherwise the arrays grow while fetching
+        :param batch_size: how many rows are fetched at once
+        :param _session: the session gets injected
+        :return: the array of each selected column by its name, in the order of the columns
+        """
+        query, params = self._get_select_query(table, keys, columns=columns, order_by=order_by, limit=limit)
+        declared_types: Dict[str, str] = {name: declared_type for _, name, declared_type, *_ in
+                                          _session.execute(text(f"PRAGMA table_info({table})"))}
+        cursor: sqlite3.Cursor = _session.connection().connection.cursor()
+        try:
+            size: int = 0
+            if presize or (presize is None and not keys):
+                # COUNT(*) scans the table, the subquery stops after [limit] rows
+                count_query, count_params = self._get_select_query(table, keys, columns=["1"], limit=limit)
+                size = cursor.execute(f"SELECT COUNT(*) FROM ({count_query})", count_params).fetchone()[0]
+
+            cursor.execute(query, params)
+            names: List[str] = [description[0] for description in cursor.description]
+            arrays: List[Optional[np.ndarray]] = []
+            for name in names:
+                dtype: Optional[np.dtype] = np.dtype(dtypes[name]) if dtypes and name in dtypes \
+                    else _get_dtype(declared_types.get(name, ""))
+                arrays.append(np.empty(size, dtype=dtype) if dtype is not None else None)
+
+            length: int = 0
+            while True:
+                rows: List[Tuple[Any, ...]] = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                end: int = length + len(rows)
+                for i, values in enumerate(zip(*rows)):
+                    arrays[i] = self._fill_column(arrays[i], length, end, values, size,
+                                                  fixed=dtypes is not None and names[i] in dtypes)
+                length = end
+        finally:
+            cursor.close()
+        columns_arrays: Dict[str, np.ndarray] = {}
+        for name, array in zip(names, arrays):
+            if array is None:
+                array = np.empty(0, dtype=object)
+            # drops the capacity, that was allocated for growing
+            columns_arrays[name] = array if len(array) == length else array[:length].copy()
+        return columns_arrays
+
+    def select_frame(self, table: str, keys: Dict[str, Any] = None, columns: List[str] = None,
+                     order_by: Union[str, List[str]] = None, limit: Optional[int] = None,
+                     dtypes: Dict[str, Any] = None, presize: Optional[bool] = None,
+                     batch_size: int = 10_000) -> DataFrame:
+        """
+        Selects the rows into a pandas DataFrame, which is built from the column arrays of `select_arrays`.
+        It can be saved with `filehandler.save_file("measurements.csv", frame)` or converted with `CsvEncoder.encode`
+        into a `Table`.
+
+        ```python
+        frame = controller.select_frame("measurements", keys={"sensor": 3}, order_by="time")
+        ```
+
+        The parameters are the ones of `select_arrays`
+        :return: a DataFrame with a column per selected column
+        """
+        return DataFrame(self.select_arrays(table, keys, columns=columns, order_by=order_by, limit=limit,
+                                            dtypes=dtypes, presize=presize, batch_size=batch_size), copy=False)
+
+    @staticmethod
+    def _fill_column(array: Optional[np.ndarray], start: int, end: int, values: Tuple[Any, ...], size: int = 0,
+                     fixed: bool = False) -> np.ndarray:
+        """
+        Copies [values] into array[start:end]. The array grows, if it is too small,
+        and its dtype is widened, if the values do not fit it, unless it is [fixed]
+        :param array: None, if the dtype is not known yet
+        :param size: the expected number of rows, if they were counted
+        :return: the filled array, which is a new one if it grew or was widened
+        """
+        if array is None:
+            batch: np.ndarray = np.array(values)
+            if batch.dtype.kind not in "if":
+                batch = np.array(values, dtype=object)
+            array = np.empty(max(size, end), dtype=batch.dtype)
+        elif array.dtype.kind in "if" and not fixed:
+            batch = np.array(values)
+            if batch.dtype.kind not in "if":
+                # NULLs or text in a numeric column
+                try:
+                    batch = np.array(values, dtype=np.float64)
+                except (TypeError, ValueError):
+                    batch = np.array(values, dtype=object)
+            dtype: np.dtype = np.result_type(array.dtype, batch.dtype) if batch.dtype.kind in "if" \
+                else np.dtype(object)
+            if dtype != array.dtype:
+                array = array.astype(dtype)
+        else:
+            batch = np.array(values, dtype=array.dtype)
+        if end > len(array):
+            grown: np.ndarray = np.empty(max(end, len(array) * 2), dtype=array.dtype)
+            grown[:start] = array[:start]
+            array = grown
+        array[start:end] = batch
+        return array
+
+    @_sessioning()
+    def _select_query(self, query: str, params: Dict[str, Any], _session: Session = None) -> List[Any]:
+        return list(_session.execute(text(query), params))
+
+    @staticmethod
+    def _get_select_query(table: str, keys: Dict[str, Any] = None, columns: List[str] = None,
+                          order_by: Union[str, List[str]] = None, limit: Optional[int] = None,
+                          condition: Optional[Tuple[str, Dict[str, Any]]] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        :param condition: an additional where condition and its parameters
+        :return: the query and its parameters
+        """
+        params: Dict[str, Any] = dict(keys or {})
+        conditions: List[str] = [f'{key} = :{key}' for key in keys or {}]
+        if condition is not None:
+            conditions.append(condition[0])
+            params.update(condition[1])
+
+        query: str = f'SELECT {",".join(columns) if columns else "*"} FROM {table}'
+        if conditions:
+            query += f' WHERE {" AND ".join(conditions)}'
+        if order_by:
+            query += f' ORDER BY {order_by if isinstance(order_by, str) else ",".join(order_by)}'
+        if limit is not None:
+            query += ' LIMIT :_limit'
+            params["_limit"] = limit
+        return query, params
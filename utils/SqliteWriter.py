@@ -0,0 +1,204 @@
+############### requirements ###############
+#
+# sqlalchemy
+#
+# .filehandler
+# .SqliteController
+#
+############################################
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple, Iterable, Union
+
+from sqlalchemy.orm import Session
+
+from .SqliteController import SqliteController
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# the writers that are still running, they are flushed and closed on exit
+_WRITERS: "weakref.WeakSet[SqliteWriter]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_writers() -> None:
+    for writer in list(_WRITERS):
+        writer.close()
+
+
+class _Write:
+    """
+    The rows of one `SqliteWriter.insert` call and the future of its result
+    """
+    __slots__ = ("query", "rows", "future")
+
+    def __init__(self, query: str, rows: List[Tuple[Any, ...]]):
+        self.query: str = query
+        self.rows: List[Tuple[Any, ...]] = rows
+        self.future: Future = Future()
+
+
+class SqliteWriter:
+    """
+    Inserts rows of many threads with a single writer thread, which groups them into few transactions.
+
+    Every commit of sqlite waits for the disk, so many threads that insert a few rows each are limited to the
+    commits per second of the disk, no matter how many rows a commit contains. The calls of `insert` only enqueue
+    the rows and return immediately. The writer thread commits everything that was enqueued while it committed
+    the previous transaction, up to [max_batch_rows] rows, in one transaction. So the more threads insert, the larger
+    the transactions get. With [max_delay] it additionally waits up to that many seconds for more rows.
+
+    ```python
+    writer = SqliteWriter(SqliteController("events.db", profile="durable"))
+    future = writer.insert("events", [{"id": 1, "name": "login"}])
+    future.result()  # the number of inserted rows, once they are committed
+    writer.flush()  # waits until everything enqueued so far is committed
+    ```
+
+    Each insert either succeeds or fails on its own: if a transaction fails, its inserts are retried one by one
+    and only the failing ones get the exception. Running writers are flushed and closed on exit.
+    """
+
+    def __init__(self, controller: SqliteController, max_batch_rows: int = 10_000, max_delay: float = 0.0):
+        """
+        :param controller: the controller of the database to write to
+        :param max_batch_rows: after how many rows a transaction is committed
+        :param max_delay: how many seconds after the first enqueued insert the transaction is committed at the latest.
+                          0 commits as soon as the queue is empty
+        """
+        self.controller: SqliteController = controller
+        self.max_batch_rows: int = max_batch_rows
+        self.max_delay: float = max_delay
+        self._queue: queue.Queue = queue.Queue()
+        self._lock: threading.Lock = threading.Lock()
+        self._closed: bool = False
+        self._thread: threading.Thread = threading.Thread(target=self._run, name=f"{self}-writer", daemon=True)
+        self._thread.start()
+        _WRITERS.add(self)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.controller._db_file})"
+
+    def __enter__(self) -> "SqliteWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def insert(self, table_name: str, entries: Iterable[Dict[str, Any]], on_conflict: Optional[str] = None,
+               conflict_columns: List[str] = None) -> Future:
+        """
+        Enqueues [entries] to be inserted like `SqliteController.insert` does
+
+        :param table_name: the table to insert into
+        :param entries: every entry represents a row to insert, with the keys representing the column names and the
+        values the corresponding value to insert. All entries need the keys of the first one
+        :param on_conflict: None, "ignore", "replace" or "update", see `SqliteController.insert`
+        :param conflict_columns: the unique columns for "update"
+        :return: a future of the number of inserted or updated rows, which is done once they are committed
+        """
+        entries = list(entries)
+        if not entries:
+            future: Future = Future()
+            future.set_result(0)
+            return future
+        columns: List[str] = list(entries[0].keys())
+        write = _Write(SqliteController._get_insert_query(table_name, columns, on_conflict, conflict_columns),
+                       [tuple(entry[column] for column in columns) for entry in entries])
+        self._put(write)
+        return write.future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until everything enqueued before is committed
+        :param timeout: the seconds to wait at most, None waits forever
+        :return: if everything was committed within [timeout]
+        """
+        barrier: threading.Event = threading.Event()
+        self._put(barrier)
+        return barrier.wait(timeout)
+
+    def close(self) -> None:
+        """
+        Commits everything enqueued so far and stops the writer thread. Later inserts raise a RuntimeError
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        _WRITERS.discard(self)
+
+    def _put(self, item: Union[_Write, threading.Event]) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self} is closed")
+            self._queue.put(item)
+
+    def _run(self) -> None:
+        stopped: bool = False
+        while not stopped:
+            item: Union[_Write, threading.Event, None] = self._queue.get()
+            batch: List[_Write] = []
+            barriers: List[threading.Event] = []
+            rows: int = 0
+            deadline: float = time.monotonic() + self.max_delay
+            while True:
+                if item is None:
+                    stopped = True
+                elif isinstance(item, threading.Event):
+                    # the caller waits for the commit, so there is no reason to wait for more rows
+                    barriers.append(item)
+                elif item.future.set_running_or_notify_cancel():
+                    batch.append(item)
+                    rows += len(item.rows)
+                if stopped or barriers or rows >= self.max_batch_rows:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if batch:
+                self._commit(batch)
+            for barrier in barriers:
+                barrier.set()
+
+    def _commit(self, batch: List[_Write]) -> None:
+        """
+        Commits [batch] in one transaction and sets the results of its futures.
+        If the transaction fails, each write is retried in its own transaction
+        """
+        try:
+            counts: List[int] = self._execute(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+                return
+            LOGGER.debug(f"{self} could not commit {len(batch)} inserts at once, retrying them one by one: {e}")
+            for write in batch:
+                self._commit([write])
+            return
+        for write, count in zip(batch, counts):
+            write.future.set_result(count)
+
+    def _execute(self, batch: List[_Write]) -> List[int]:
+        counts: List[int] = []
+        session: Session
+        with self.controller.session() as session:
+            cursor: sqlite3.Cursor = session.connection().connection.cursor()
+            try:
+                for write in batch:
+                    cursor.executemany(write.query, write.rows)
+                    counts.append(cursor.rowcount)
+            finally:
+                cursor.close()
+            session.commit()
+        return counts
@@ -0,0 +1,151 @@
+############### requirements ###############
+#
+# .filehandler
+#
+############################################
+import logging
+import os
+import pickle
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Callable, BinaryIO
+
+from .filehandler import to_abs_file_path, create_dir, save_file, load_file, get_files_in_dir, load_pickle_stream, \
+    delete_file
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# the state name, its value and the settings it was created with or None if it is an update
+JournalRecord = Tuple[str, Any, Optional[Tuple]]
+
+
+class StateJournal:
+    """
+    Persists the states of a `StateManager` in [directory] (relative to the project root).
+
+    Every change is appended as a compact pickled record to a write-ahead journal.
+    After [snapshot_every] records a snapshot of all states is written and the journal up to it is removed,
+    so restoring never replays more than [snapshot_every] records, no matter how long the process ran.
+
+    ```python
+    StateManager().persist(StateJournal("state"))
+    ```
+
+    The journal segments are called `journal-<n>.pickl`, the snapshot `snapshot.pickl`.
+    Each snapshot knows the first segment it does not contain, so a crash at any point loses at most the record
+    that was being written.
+    """
+    SNAPSHOT_FILE: str = "snapshot.pickl"
+    _SEGMENT_PATTERN: re.Pattern = re.compile(r"journal-(\d+)\.pickl$")
+
+    def __init__(self, directory: str, snapshot_every: int = 100_000, fsync: bool = False):
+        """
+        :param directory: the directory relative to the project root
+        :param snapshot_every: after how many records a snapshot is written
+        :param fsync: if every record is forced to disk. Otherwise it only survives crashes of the process,
+                      not of the machine
+        """
+        self._directory: str = directory
+        self.snapshot_every: int = snapshot_every
+        self.fsync: bool = fsync
+        self._segment: int = 0
+        self._file: Optional[BinaryIO] = None
+        self._records_since_snapshot: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._snapshot_lock: threading.Lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._directory})"
+
+    def restore(self) -> Dict[str, Tuple[Any, Optional[Tuple]]]:
+        """
+        Loads the snapshot and replays the journal after it.
+        :return: the last value and the creation settings per state name
+        """
+        create_dir(self._directory)
+        snapshot: Optional[Dict[str, Any]] = load_file(self._get_file_path(self.SNAPSHOT_FILE), is_abs=True)
+        states: Dict[str, Tuple[Any, Optional[Tuple]]] = snapshot["states"] if snapshot else {}
+        first_segment: int = snapshot["segment"] if snapshot else 0
+
+        segments: List[int] = [segment for segment in self._get_segments() if segment >= first_segment]
+        replayed: int = 0
+        for segment in segments:
+            for state_name, value, settings in load_pickle_stream(self._get_segment_path(segment), is_abs=True):
+                if settings is None and state_name in states:
+                    settings = states[state_name][1]
+                states[state_name] = (value, settings)
+                replayed += 1
+        LOGGER.debug(f"Restored {len(states)} states from {self} and replayed {replayed} records")
+
+        with self._lock:
+            self._segment = max(segments, default=first_segment) + 1
+            self._records_since_snapshot = replayed
+        return states
+
+    def append(self, records: List[JournalRecord]) -> bool:
+        """
+        Appends [records] to the journal
+        :return: if a snapshot is due. It is only returned to one caller, who should call `snapshot`
+        """
+        data: bytes = b"".join(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL) for record in records)
+        with self._lock:
+            if self._file is None:
+                create_dir(self._directory)
+                self._file = open(self._get_segment_path(self._segment), "ab")
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._records_since_snapshot += len(records)
+            if self._records_since_snapshot < self.snapshot_every:
+                return False
+            self._records_since_snapshot = 0
+            return True
+
+    def snapshot(self, get_states: Callable[[], Dict[str, Tuple[Any, Optional[Tuple]]]]) -> None:
+        """
+        Writes a snapshot and removes the journal segments it contains.
+        :param get_states: returns the current value and creation settings per state name.
+        It is called after the journal moved on to a new segment, so every record of the old segments
+        is contained in what it returns
+        """
+        with self._snapshot_lock:
+            with self._lock:
+                self._close_segment()
+                self._segment += 1
+                first_segment: int = self._segment
+            states: Dict[str, Tuple[Any, Optional[Tuple]]] = get_states()
+
+            create_dir(self._directory)
+            file_path: str = self._get_file_path(self.SNAPSHOT_FILE)
+            tmp_file_path: str = f"{file_path[:-len('.pickl')]}.tmp.pickl"
+            save_file(tmp_file_path, {"segment": first_segment, "states": states}, is_abs=True)
+            os.replace(tmp_file_path, file_path)
+
+            for segment in self._get_segments():
+                if segment < first_segment:
+                    delete_file(self._get_segment_path(segment), is_abs=True)
+            LOGGER.debug(f"Wrote a snapshot of {len(states)} states to {self}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_segment()
+
+    def _close_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _get_segments(self) -> List[int]:
+        segments: List[int] = []
+        for file in get_files_in_dir(self._directory, endings=["pickl"]) or []:
+            match: Optional[re.Match] = self._SEGMENT_PATTERN.search(file)
+            if match is not None:
+                segments.append(int(match.group(1)))
+        return sorted(segments)
+
+    def _get_segment_path(self, segment: int) -> str:
+        return self._get_file_path(f"journal-{segment}.pickl")
+
+    def _get_file_path(self, file_name: str) -> str:
+        return os.path.join(to_abs_file_path(self._directory), file_name)
@@ -1,32 +1,498 @@
+import functools
+import gc
+import heapq
+import itertools
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from copy import deepcopy
-from dataclasses import dataclass
-from typing import Dict, Any, Callable, List, Optional, Union
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, List, Optional, Union, Deque, Hashable, Tuple, Iterator, Set, TYPE_CHECKING
 
 from .Singleton import Singleton
-from .util import get_pub_attr_of_class
+from .util import get_pub_attr_of_class, freeze, get_deep_size, FrozenDict
+
+if TYPE_CHECKING:
+    from .SharedStateStore import SharedStateStore, SharedRecord
+    from .StateJournal import StateJournal
 
 LOGGER: logging.Logger = logging.getLogger(__name__)
 
+_timer: Optional["_Timer"] = None
+_timer_lock: threading.Lock = threading.Lock()
+
+
+class _Timer:
+    """
+    One daemon thread that runs the deliveries of all rate limited subscribers at their due time,
+    instead of a timer thread per subscriber
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Callable[[], None]]] = []
+        self._sequence: Iterator[int] = itertools.count()
+        self._condition: threading.Condition = threading.Condition()
+        self._thread: threading.Thread = threading.Thread(target=self._run, name="StateManager-timer", daemon=True)
+        self._thread.start()
+
+    def schedule(self, when: float, callback: Callable[[], None]) -> None:
+        """
+        :param when: the `time.monotonic()` timestamp to run [callback] at
+        """
+        with self._condition:
+            heapq.heappush(self._heap, (when, next(self._sequence), callback))
+            if self._heap[0][2] is callback:
+                self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, callback = heapq.heappop(self._heap)
+            try:
+                callback()
+            except Exception as e:
+                LOGGER.exception(f"{e.__class__.__name__} occurred in a delayed notification: {e}")
+
+
+def _get_timer() -> _Timer:
+    """
+    :return: the timer shared by all subscribers. It is created on first usage
+    """
+    global _timer
+    if _timer is None:
+        with _timer_lock:
+            if _timer is None:
+                _timer = _Timer()
+    return _timer
+
+
+class _RateLimit:
+    """
+    The pending notification of a rate limited subscriber about one state
+    """
+
+    def __init__(self):
+        self.value: Any = None
+        self.copy: Optional[Callable[[Any], Any]] = None
+        self.is_scheduled: bool = False
+        # debounce: the end of the quiet period
+        self.due: float = 0.0
+        self.last_delivery: float = -float("inf")
+
 
 @dataclass
 class Subscriber:
+    """
+    [coalesce] only matters for states with a `Dispatcher`: if the subscriber falls behind,
+    only the latest pending value is delivered instead of every one
+
+    The rate of the notifications can be limited per state, all in seconds. Only the latest value is delivered.
+    - [debounce]: delivers after there were no changes for that long
+    - [throttle]: delivers at most once per interval, the first change right away
+    - [sample]: delivers at fixed intervals, if there were changes in the last one
+
+    Rate limited notifications are delivered on one timer thread shared by all subscribers,
+    so their callbacks should be quick. For mutable states the value is only copied when it is delivered.
+    """
     id: str
     callback: Callable[[Any], None]
+    coalesce: bool = False
+    debounce: Optional[float] = None
+    throttle: Optional[float] = None
+    sample: Optional[float] = None
+    _rate_limits: Dict[Hashable, _RateLimit] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False, compare=False)
 
     def notify(self, state: Any):
         self.callback(state)
 
+    @property
+    def is_rate_limited(self) -> bool:
+        return self.debounce is not None or self.throttle is not None or self.sample is not None
+
+    def offer(self, key: Hashable, value: Any, copy: Optional[Callable[[Any], Any]] = None) -> None:
+        """
+        Notifies about [value] with respect to [debounce], [throttle] and [sample]
+        :param key: identifies the state, the rate is limited per state
+        :param value: the new value. It must not be mutated afterwards
+        :param copy: if provided, it is applied to the value, that actually gets delivered
+        """
+        if not self.is_rate_limited:
+            self.notify(copy(value) if copy is not None else value)
+            return
+
+        now: float = time.monotonic()
+        with self._lock:
+            rate_limit: Optional[_RateLimit] = self._rate_limits.get(key)
+            if rate_limit is None:
+                rate_limit = self._rate_limits[key] = _RateLimit()
+            rate_limit.value = value
+            rate_limit.copy = copy
+            if self.debounce is not None:
+                rate_limit.due = now + self.debounce
+            if rate_limit.is_scheduled:
+                return
+            rate_limit.is_scheduled = True
+            if self.debounce is not None:
+                when: float = rate_limit.due
+            elif self.throttle is not None:
+                when = max(now, rate_limit.last_delivery + self.throttle)
+            else:
+                when = (now // self.sample + 1) * self.sample
+        _get_timer().schedule(when, functools.partial(self._deliver_pending, key))
+
+    def _deliver_pending(self, key: Hashable) -> None:
+        now: float = time.monotonic()
+        with self._lock:
+            rate_limit: _RateLimit = self._rate_limits[key]
+            if self.debounce is not None and rate_limit.due > now:
+                # it changed again in the meantime
+                _get_timer().schedule(rate_limit.due, functools.partial(self._deliver_pending, key))
+                return
+            value, copy = rate_limit.value, rate_limit.copy
+            rate_limit.value = rate_limit.copy = None
+            rate_limit.is_scheduled = False
+            rate_limit.last_delivery = now
+        self.notify(copy(value) if copy is not None else value)
+
+
+class Dispatcher:
+    """
+    Delivers the notifications of states asynchronously on a bounded pool of worker threads,
+    so `set_state` does not wait for the subscribers.
+
+    - `set_state` only enqueues the change, the fan out to the subscribers happens on a worker
+    - every subscription has its own queue, so notifications arrive in order per subscriber and state
+    - subscribers with `coalesce=True` only get the latest value if they fall behind
+    - an exception of a subscriber is logged and does not affect the others
+
+    ```
+    dispatcher = Dispatcher(max_workers=4)
+    StateManager().set_state("ip", get_ip_address(), dispatcher=dispatcher)
+    ```
+    """
+
+    def __init__(self, max_workers: int = 4, batch_size: int = 100):
+        """
+        :param max_workers: how many notifications are delivered in parallel
+        :param batch_size: how many notifications of one queue are delivered before other queues get their turn
+        """
+        self.batch_size: int = batch_size
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_workers,
+                                                                thread_name_prefix="StateManager-dispatch")
+        self._lock: threading.Lock = threading.Lock()
+        self._idle: threading.Condition = threading.Condition(self._lock)
+        # only queues that are scheduled on the executor are in here
+        self._queues: Dict[Hashable, Deque[Any]] = {}
+
+    def publish(self, state: "_State", value: Any) -> None:
+        """
+        Enqueues the notification of all subscribers of [state] about [value]
+        """
+        self._put(state.name, (state, value), self._fan_out)
+
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Blocks until all pending notifications are delivered
+        :param timeout: the maximum seconds to wait
+        :return: False if it timed out
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._queues, timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _fan_out(self, item: Tuple["_State", Any]) -> None:
+        state, value = item
+        for subscriber in state.get_subscribers():
+            if subscriber.is_rate_limited:
+                subscriber.offer(state.name, value, state._copy)
+                continue
+            self._put((state.name, subscriber.id), (subscriber, state._copy(value)), self._deliver,
+                      coalesce=subscriber.coalesce)
+
+    @staticmethod
+    def _deliver(item: Tuple[Subscriber, Any]) -> None:
+        subscriber, value = item
+        subscriber.notify(value)
+
+    def _put(self, queue_key: Hashable, item: Any, handler: Callable[[Any], None], coalesce: bool = False) -> None:
+        with self._lock:
+            queue: Optional[Deque[Any]] = self._queues.get(queue_key)
+            if queue is not None:
+                if coalesce:
+                    queue.clear()
+                queue.append(item)
+                return
+            self._queues[queue_key] = deque([item])
+        self._executor.submit(self._drain, queue_key, handler)
+
+    def _drain(self, queue_key: Hashable, handler: Callable[[Any], None]) -> None:
+        for _ in range(self.batch_size):
+            with self._lock:
+                queue: Deque[Any] = self._queues[queue_key]
+                if not queue:
+                    del self._queues[queue_key]
+                    if not self._queues:
+                        self._idle.notify_all()
+                    return
+                item: Any = queue.popleft()
+            try:
+                handler(item)
+            except Exception as e:
+                LOGGER.exception(f"{e.__class__.__name__} occurred while notifying {queue_key}: {e}")
+        self._executor.submit(self._drain, queue_key, handler)
+
+
+class _TopicNode:
+    def __init__(self):
+        self.children: Dict[str, _TopicNode] = {}
+        self.subscribers: Dict[str, Subscriber] = {}
+
+
+class _TopicIndex:
+    """
+    A trie of the subscribed topics, with the segments of the dot separated state names as edges.
+
+    A topic is either a plain state name or a pattern: "*" matches exactly one segment, "**" any number of segments.
+    E.g. "sensor.*.temp" matches "sensor.zone3.temp" and "sensor.zone3.**" matches "sensor.zone3.temp.max".
+    Resolving the subscribers of a state name takes time proportional to its depth, not to the number of topics.
+    The results are cached until the subscriptions change.
+    A reverse index of the topics per subscriber makes `unsubscribe_all` proportional to its subscriptions.
+    """
+    SEPARATOR: str = "."
+
+    def __init__(self):
+        self._root: _TopicNode = _TopicNode()
+        self._topics_by_subscriber: Dict[str, Set[str]] = {}
+        self._cache: Dict[str, List[Subscriber]] = {}
+        self._lock: threading.RLock = threading.RLock()
+
+    def subscribe(self, topic: str, subscriber: Subscriber) -> bool:
+        with self._lock:
+            node: _TopicNode = self._root
+            for segment in topic.split(self.SEPARATOR):
+                node = node.children.setdefault(segment, _TopicNode())
+            if subscriber.id in node.subscribers:
+                return False
+            node.subscribers[subscriber.id] = subscriber
+            self._topics_by_subscriber.setdefault(subscriber.id, set()).add(topic)
+            self._cache.clear()
+            return True
+
+    def unsubscribe(self, topic: str, subscriber_id: str) -> bool:
+        with self._lock:
+            if topic not in self._topics_by_subscriber.get(subscriber_id, ()):
+                return False
+            path: List[Tuple[_TopicNode, str]] = []
+            node: _TopicNode = self._root
+            for segment in topic.split(self.SEPARATOR):
+                path.append((node, segment))
+                node = node.children[segment]
+            node.subscribers.pop(subscriber_id)
+            # prune the branches that lead to nothing anymore
+            for parent, segment in reversed(path):
+                child: _TopicNode = parent.children[segment]
+                if child.children or child.subscribers:
+                    break
+                del parent.children[segment]
+
+            topics: Set[str] = self._topics_by_subscriber[subscriber_id]
+            topics.discard(topic)
+            if not topics:
+                del self._topics_by_subscriber[subscriber_id]
+            self._cache.clear()
+            return True
+
+    def unsubscribe_all(self, subscriber_id: str) -> bool:
+        with self._lock:
+            topics: Set[str] = set(self._topics_by_subscriber.get(subscriber_id, ()))
+            for topic in topics:
+                self.unsubscribe(topic, subscriber_id)
+            return bool(topics)
+
+    def get_topics(self, subscriber_id: str) -> List[str]:
+        """
+        :return: the topics [subscriber_id] is subscribed to
+        """
+        with self._lock:
+            return list(self._topics_by_subscriber.get(subscriber_id, ()))
+
+    def match(self, state_name: str) -> List[Subscriber]:
+        """
+        :return: the subscribers of all topics matching [state_name], each subscriber only once
+        """
+        subscribers: Optional[List[Subscriber]] = self._cache.get(state_name)
+        if subscribers is not None:
+            return subscribers
+        with self._lock:
+            matches: Dict[str, Subscriber] = {}
+            self._collect(self._root, state_name.split(self.SEPARATOR), 0, matches)
+            subscribers = list(matches.values())
+            self._cache[state_name] = subscribers
+            return subscribers
+
+    def _collect(self, node: _TopicNode, segments: List[str], index: int, matches: Dict[str, Subscriber]) -> None:
+        any_segments: Optional[_TopicNode] = node.children.get("**")
+        if any_segments is not None:
+            for next_index in range(index, len(segments) + 1):
+                self._collect(any_segments, segments, next_index, matches)
+        if index == len(segments):
+            for subscriber_id, subscriber in node.subscribers.items():
+                matches.setdefault(subscriber_id, subscriber)
+            return
+        for segment in (segments[index], "*"):
+            child: Optional[_TopicNode] = node.children.get(segment)
+            if child is not None:
+                self._collect(child, segments, index + 1, matches)
+
+
+_FULL: int = 0
+_DICT_DELTA: int = 1
+_SEQUENCE_DELTA: int = 2
+
+
+def _is_same(a: Any, b: Any) -> bool:
+    """
+    :return: if [a] and [b] are equal. Values that cannot be compared to a bool, like numpy arrays, which compare
+             elementwise, are treated as different
+    """
+    if a is b:
+        return True
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+# the types a delta can be decoded into. Subclasses like defaultdict or namedtuples cannot be rebuilt the same way
+_DICT_DELTA_TYPES: Tuple[type, ...] = (dict, FrozenDict)
+_SEQUENCE_DELTA_TYPES: Tuple[type, ...] = (list, tuple)
+
+
+def _encode_delta(old: Any, new: Any) -> Tuple:
+    """
+    Encodes [old] as the difference to [new], if both are dicts or lists / tuples of the same type
+    and the difference is smaller. Other types, including subclasses, are kept in full
+    """
+    if type(old) is not type(new):
+        return _FULL, old
+    if type(old) in _DICT_DELTA_TYPES:
+        removed: Dict[Any, Any] = {key: value for key, value in old.items()
+                                   if key not in new or not _is_same(new[key], value)}
+        added: List[Any] = [key for key in new if key not in old]
+        if len(removed) + len(added) < len(old):
+            return _DICT_DELTA, removed, added
+    elif type(old) in _SEQUENCE_DELTA_TYPES:
+        max_common: int = min(len(old), len(new))
+        prefix: int = 0
+        while prefix < max_common and _is_same(old[prefix], new[prefix]):
+            prefix += 1
+        suffix: int = 0
+        while suffix < max_common - prefix and _is_same(old[-suffix - 1], new[-suffix - 1]):
+            suffix += 1
+        if prefix + suffix > 0:
+            return _SEQUENCE_DELTA, prefix, len(new) - suffix, old[prefix:len(old) - suffix]
+    return _FULL, old
+
+
+def _decode_delta(entry: Tuple, new: Any) -> Any:
+    """
+    Restores the value [entry] was encoded from, with [new] being the value it was encoded against
+    """
+    if entry[0] == _DICT_DELTA:
+        _, removed, added = entry
+        added = set(added)
+        restored: Dict[Any, Any] = {key: value for key, value in new.items() if key not in added}
+        restored.update(removed)
+        return type(new)(restored)
+    if entry[0] == _SEQUENCE_DELTA:
+        _, start, end, old_slice = entry
+        return new[:start] + old_slice + new[end:]
+    return entry[1]
+
+
+class _History:
+    """
+    The previous values of a state in a ring buffer: appending and dropping the oldest value are O(1).
+
+    With [delta] dicts and lists are stored as difference to the value that replaced them,
+    so large states with small changes are cheap to keep. Restoring the n-th previous value then takes n steps.
+    With [max_bytes] the oldest values are dropped, as soon as the estimated memory usage exceeds it.
+    """
+
+    def __init__(self, capacity: int, delta: bool = False, max_bytes: Optional[int] = None):
+        """
+        :param capacity: how many values are kept. If it is 0 none, if it is negative all
+        :param delta: if dicts and lists are stored as differences
+        :param max_bytes: the maximal estimated memory usage
+        """
+        self.capacity: int = capacity
+        self.delta: bool = delta
+        self.max_bytes: Optional[int] = max_bytes
+        self._entries: Deque[Tuple[Tuple, int]] = deque()
+        self._bytes: int = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def push(self, old: Any, new: Any) -> None:
+        """
+        :param old: the value that gets replaced
+        :param new: the value that replaces it
+        """
+        if self.capacity == 0:
+            return
+        entry: Tuple = _encode_delta(old, new) if self.delta else (_FULL, old)
+        size: int = get_deep_size(entry) if self.max_bytes is not None else 0
+        if 0 < self.capacity <= len(self._entries):
+            self._drop_oldest()
+        self._entries.append((entry, size))
+        self._bytes += size
+        while self.max_bytes is not None and self._bytes > self.max_bytes and self._entries:
+            self._drop_oldest()
+
+    def get(self, index: int, current: Any) -> Optional[Any]:
+        """
+        :param index: 1 is the previous value, 2 the one before and so on
+        :param current: the current value of the state
+        :return: the value or None if there are not that many values stored
+        """
+        if index < 1 or index > len(self._entries):
+            return None
+        if not self.delta:
+            return self._entries[-index][0][1]
+        value: Any = current
+        for i in range(1, index + 1):
+            value = _decode_delta(self._entries[-i][0], value)
+        return value
+
+    def _drop_oldest(self) -> None:
+        _, size = self._entries.popleft()
+        self._bytes -= size
+
 
 class _State:
     name: str
     _value: Any
-    _history: List[Any]
-    _history_len: int
+    _history: _History
     _subscribers: Dict[str, Subscriber]
     _type: type
+    _immutable: bool
+    _dispatcher: Optional[Dispatcher]
+    _topics: Optional[_TopicIndex]
+    # incremented on every change, so derived states can tell if they are outdated
+    _version: int
 
-    def __init__(self, name: str, value: Any = None, type=None, history_len=10):
+    def __init__(self, name: str, value: Any = None, type=None, history_len=10, immutable: bool = False,
+                 dispatcher: Optional[Dispatcher] = None, history_delta: bool = False,
+                 history_max_bytes: Optional[int] = None, topics: Optional[_TopicIndex] = None):
         """
 
         :param name: the name of the state
@@ -34,13 +500,23 @@ class _State:
         :param type: the type the value can be. If none is provided, it accepts any type as new state
         :param history_len: how many rollback states are saved.
         If it is 0 no history will be available, if it is set to a negative value, the history saves all values
+        :param immutable: if True, the value is frozen once on set (see `util.freeze`) and every reader and subscriber
+        gets that same read-only snapshot. Otherwise everyone gets an own deep copy
+        :param dispatcher: if provided, subscribers are notified asynchronously through it
+        :param history_delta: if dicts and lists are stored in the history as differences to their successor
+        :param history_max_bytes: if provided, the oldest history values are dropped when the estimated memory usage
+        of the history exceeds it
+        :param topics: if provided, the subscribers of the matching topics are notified as well
         """
         self.name = name
-        self._value = value
-        self._history_len = history_len
-        self._history = []
+        self._immutable = immutable
+        self._value = freeze(value) if immutable else value
+        self._history = _History(history_len, delta=history_delta, max_bytes=history_max_bytes)
         self._subscribers = {}
         self._type = type
+        self._dispatcher = dispatcher
+        self._topics = topics
+        self._version = 0
 
     def subscribe(self, subscriber: Subscriber) -> bool:
         if subscriber.id in self._subscribers:
@@ -57,38 +533,151 @@ class _State:
             return False
 
     def notify(self):
-        for subscriber in self._subscribers.values():
-            subscriber.notify(self.get_value())
+        if self._dispatcher is not None:
+            self._dispatcher.publish(self, self._value)
+            return
+        for subscriber in self.get_subscribers():
+            if subscriber.is_rate_limited:
+                subscriber.offer(self.name, self._value, self._copy)
+            else:
+                subscriber.notify(self.get_value())
 
     def get_value(self) -> Any:
-        return deepcopy(self._value)
+        return self._copy(self._value)
+
+    def _copy(self, value: Any) -> Any:
+        if self._immutable:
+            return value
+        return deepcopy(value)
 
     def set_value(self, value: Any) -> bool:
-        if self._type is not None:
-            if not isinstance(value, self._type):
-                return False
+        if not self.accepts(value):
+            return False
 
-        self._update_history()
-        self._value = deepcopy(value)
-        self.notify()
+        self._apply(self._prepare(value))
         return True
 
+    def accepts(self, value: Any) -> bool:
+        """
+        :return: if [value] is of the type of this state
+        """
+        return self._type is None or isinstance(value, self._type)
+
+    def _prepare(self, value: Any) -> Any:
+        """
+        :return: the value as it is stored, so later changes of the callers object do not leak into the state
+        """
+        return freeze(value) if self._immutable else deepcopy(value)
+
+    def _apply(self, value: Any, notify: bool = True):
+        """
+        Sets an already prepared value
+        """
+        self._history.push(self._value, value)
+        self._value = value
+        self._version += 1
+        if notify:
+            self.notify()
+
     def roll_back(self, index: int = 1) -> Optional[Any]:
-        if index > self._history_len:
-            return None
-        return self._history[-index]
-        
+        """
+        :param index: 1 is the previous value, 2 the one before and so on
+        :return: the value or None if there are not that many values in the history
+        """
+        value: Optional[Any] = self._history.get(index, self._value)
+        return self._copy(value) if value is not None else None
+
+    def get_settings(self) -> Tuple:
+        """
+        :return: the arguments this state was created with, except for the [dispatcher] and the [topics]
+        """
+        return (self._type, self._immutable, self._history.capacity, self._history.delta,
+                self._history.max_bytes)
+
+    @classmethod
+    def from_settings(cls, name: str, value: Any, settings: Optional[Tuple], **kwargs) -> "_State":
+        """
+        :param settings: as returned by `get_settings`. If None, the defaults are used
+        """
+        if settings is None:
+            return cls(name=name, value=value, **kwargs)
+        type, immutable, history_len, history_delta, history_max_bytes = settings
+        return cls(name=name, value=value, type=type, immutable=immutable, history_len=history_len,
+                   history_delta=history_delta, history_max_bytes=history_max_bytes, **kwargs)
+
     def get_subscriber_ids(self) -> List[str]:
-        return list(self._subscribers.keys())
+        return [subscriber.id for subscriber in self.get_subscribers()]
 
-    def _update_history(self):
-        if self._history_len == 0:
-            return
-        self._history.append(self._value)
-        if self._history_len < 0:
-            return
-        if self._history_len < len(self._history):
-            self._history.pop(0)
+    def get_subscribers(self) -> List[Subscriber]:
+        """
+        :return: the own subscribers and the ones of matching topics, each only once
+        """
+        if self._topics is None:
+            return list(self._subscribers.values())
+        topic_subscribers: List[Subscriber] = self._topics.match(self.name)
+        if not self._subscribers:
+            return topic_subscribers
+        return list(self._subscribers.values()) + [subscriber for subscriber in topic_subscribers
+                                                   if subscriber.id not in self._subscribers]
+
+
+class _ComputedState(_State):
+    """
+    A state, whose value is computed from the values of other states.
+    It is marked dirty when one of its dependencies changes and only recomputed when it is read or notified.
+    """
+    compute: Callable[..., Any]
+    dependencies: List[str]
+    # counts the invalidations, it is dirty until the value is computed for the latest one
+    _generation: int
+    _computed_generation: int
+    # the versions of the dependencies the value was computed from
+    _input_versions: Optional[List[int]]
+    # serializes the computations of this state, so it is not computed twice for the same change
+    _compute_lock: threading.Lock
+
+    def __init__(self, name: str, compute: Callable[..., Any], dependencies: List[str], **kwargs):
+        super().__init__(name=name, **kwargs)
+        self.compute = compute
+        self.dependencies = dependencies
+        self._generation = 1
+        self._computed_generation = 0
+        self._input_versions = None
+        self._compute_lock = threading.Lock()
+
+    @property
+    def _dirty(self) -> bool:
+        return self._generation != self._computed_generation
+
+
+class _LockStripes:
+    """
+    A fixed number of locks a state name is mapped to by its hash.
+    Unrelated states only contend, if they happen to share a stripe, while no lock per state has to be created
+    or looked up under a global lock.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks: List[threading.RLock] = [threading.RLock() for _ in range(stripes)]
+
+    def get(self, state_name: str) -> threading.RLock:
+        return self._locks[hash(state_name) % len(self._locks)]
+
+    @contextmanager
+    def all_of(self, state_names: List[str]) -> Iterator[None]:
+        """
+        Holds the locks of all [state_names]. They are always acquired in the same order, so this cannot deadlock
+        with another call of it
+        """
+        locks: List[threading.RLock] = [self._locks[index] for index in
+                                        sorted({hash(state_name) % len(self._locks) for state_name in state_names})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
 
 
 class StateManager:
@@ -120,23 +709,116 @@ class StateManager:
             state_manager.set_state("ip", getIpAddress())
         ```
 
+        The [StateManager] is thread-safe. Writes of a state are serialized by a lock striped by the state name,
+        so writers of unrelated states do not wait on each other. Readers do not lock at all:
+        a value is never mutated after it is set, so they always get a complete one.
+        Subscribers are notified after the lock is released, always with the value current at that time.
+
         """
     _states: Dict[str, _State] = {}
+    _locks: _LockStripes = _LockStripes()
+    _journal: Optional["StateJournal"] = None
+    _shared_store: Optional["SharedStateStore"] = None
+    # the names of the computed states that depend on a state name. The sets are replaced, never mutated,
+    # so they can be read without a lock
+    _dependents: Dict[str, Set[str]] = {}
+    # serializes the creation of computed states, computing them does not take it
+    _computation_lock: threading.RLock = threading.RLock()
+    _topics: _TopicIndex = _TopicIndex()
+    # holds the pending changes of the transaction of each thread
+    _local: threading.local = threading.local()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Applies all `set_state` calls within it at once, when the block is left.
+        Until then the changes are only visible to `get_state` of the same thread.
+        Each changed state gets one history entry and its subscribers one notification with the final value,
+        after all changes are applied. So they never see an inconsistent combination of states.
+        If an exception is raised in the block, all changes are discarded.
+        Nested transactions join the outer one.
+
+        ```
+        with state_manager.transaction():
+            state_manager.set_state("temperature", 21.5)
+            state_manager.set_state("humidity", 40)
+        ```
+        """
+        if self._get_transaction() is not None:
+            yield
+            return
+
+        self._local.transaction = {}
+        try:
+            yield
+        except BaseException:
+            self._local.transaction = None
+            raise
+        changes: Dict[str, Tuple[_State, Any]] = self._local.transaction
+        self._local.transaction = None
+        self._commit(changes)
 
-    def set_state(self, state_name: str, state: Any, type: type = None) -> bool:
+    def set_state(self, state_name: str, state: Any, type: type = None, immutable: bool = False,
+                  dispatcher: Optional[Dispatcher] = None, history_len: int = 10, history_delta: bool = False,
+                  history_max_bytes: Optional[int] = None) -> bool:
         """
         Updates a state or creates it if the [state_name] is new
         :param state_name: the state identifier
         :param state: the new state
         :param type: if specified and [state_name] is new, the state will be type secure.
                      Meaning it will only set to the specified [type]
+        :param immutable: if specified and [state_name] is new, the state is frozen once per set and all readers and
+                          subscribers share that read-only snapshot instead of getting own deep copies.
+                          Dicts are then `FrozenDict`s, lists tuples and sets frozensets
+        :param dispatcher: if specified and [state_name] is new, the subscribers are notified asynchronously through
+                           it and `set_state` returns without waiting for them
+        :param history_len: if specified and [state_name] is new, how many previous values are kept.
+                            0 keeps none, a negative value all
+        :param history_delta: if specified and [state_name] is new, dicts and lists are kept in the history as
+                              differences to their successor, which is cheap for large states with small changes
+        :param history_max_bytes: if specified and [state_name] is new, the oldest previous values are dropped when
+                                  the estimated memory usage of the history exceeds it
         :return: bool of success. It could fail due [state] is not of the type-secure type
         """
-        if state_name in self._states:
-            return self._states[state_name].set_value(state)
-        else:
-            self._states[state_name] = _State(name=state_name, value=state, type=type)
-            return True
+        transaction: Optional[Dict[str, Tuple[_State, Any]]] = self._get_transaction()
+        if transaction is not None:
+            return self._set_state_in_transaction(transaction, state_name, state, type=type, immutable=immutable,
+                                                  dispatcher=dispatcher, history_len=history_len,
+                                                  history_delta=history_delta, history_max_bytes=history_max_bytes)
+
+        existing_state: Optional[_State] = self._states.get(state_name)
+        if isinstance(existing_state, _ComputedState):
+            LOGGER.debug(f"Could not set_state {state_name}: It is a computed state")
+            return False
+        if existing_state is None:
+            with self._locks.get(state_name):
+                existing_state = self._states.get(state_name)
+                if existing_state is None:
+                    new_state: _State = _State(name=state_name, value=state, type=type, immutable=immutable,
+                                               dispatcher=dispatcher, history_len=history_len,
+                                               history_delta=history_delta, history_max_bytes=history_max_bytes,
+                                               topics=self._topics)
+                    self._states[state_name] = new_state
+                    snapshot_due: bool = self._write_records([(state_name, new_state._value,
+                                                               new_state.get_settings())])
+            if existing_state is None:
+                # pattern subscribers and subscribers of not yet existing states get the first value
+                new_state.notify()
+                self._update_computed_states([state_name])
+                self._snapshot_if(snapshot_due)
+                return True
+
+        if not existing_state.accepts(state):
+            return False
+        # copying or freezing is the expensive part and does not need the lock
+        value: Any = existing_state._prepare(state)
+        with self._locks.get(state_name):
+            existing_state._apply(value, notify=False)
+            snapshot_due = self._write_records([(state_name, value, None)])
+        existing_state.notify()
+        self._update_computed_states([state_name])
+        self._snapshot_if(snapshot_due)
+        return True
 
     def get_state(self, state_name: str) -> Optional[Any]:
         """
@@ -144,38 +826,56 @@ class StateManager:
         :param state_name: the state identifier
         :return: the states value or None if [state_name] unknown
         """
-        if state_name in self._states:
-            return self._states[state_name].get_value()
+        transaction: Optional[Dict[str, Tuple[_State, Any]]] = self._get_transaction()
+        if transaction is not None and state_name in transaction:
+            state, value = transaction[state_name]
+            return state._copy(value)
+        state: Optional[_State] = self._states.get(state_name)
+        if isinstance(state, _ComputedState) and state._dirty:
+            self._refresh(state)
+        if state is not None:
+            return state.get_value()
         else:
             LOGGER.debug(f"Could get_state {state_name}: No such state name")
 
+    def get_previous_state(self, state_name: str, index: int = 1) -> Optional[Any]:
+        """
+        Returns a previous value of a given [state_name] from its history
+        :param state_name: the state identifier
+        :param index: 1 is the previous value, 2 the one before and so on
+        :return: the value or None if [state_name] is unknown or its history has not that many values
+        """
+        if state_name in self._states:
+            with self._locks.get(state_name):
+                return self._states[state_name].roll_back(index)
+        LOGGER.debug(f"Could not get_previous_state {state_name}: No such state name")
+
     def subscribe(self, state_name: str, subscriber: Subscriber) -> bool:
         """
-        Subscribes to a state
+        Subscribes to a state or a pattern of dot separated state names.
+        In a pattern "*" matches exactly one segment and "**" any number of segments,
+        e.g. "sensor.*.temp" or "sensor.zone3.**".
+        The state does not need to exist yet, the subscriber is notified as soon as it is set.
         :param subscriber: the subscriber to be notified on changes
-        :param state_name: The state_identifier
+        :param state_name: The state_identifier or pattern
         :return: bool of success. It could fail due subscribing with an already subscribed [subscriber_id]
-                 or to an unknown [state_name]
         """
-        if state_name in self._states:
-            return self._states[state_name].subscribe(subscriber)
-        else:
-            LOGGER.debug(f"Could not subscribe {subscriber.id} to {state_name}: No such state name")
-            return False
+        if self._topics.subscribe(state_name, subscriber):
+            return True
+        LOGGER.debug(f"Could not subscribe {subscriber.id} to {state_name}: Already subscribed")
+        return False
 
     def unsubscribe(self, state_name: str, subscriber_id: str) -> bool:
         """
         Unsubscribe a [subscriber_id] from a state with [state_name] identifier
-        :param state_name: the identifier of the state you want to unsub from
+        :param state_name: the identifier or pattern of the state you want to unsub from
         :param subscriber_id: the identifier of the subscriber
-        :return: bool of success. It could fail due to an unknown [state_name] 
-                or because [subscriber_id] is not a subscriber of [state_name]
+        :return: bool of success. It could fail because [subscriber_id] is not a subscriber of [state_name]
         """
-        if state_name in self._states:
-            return self._states[state_name].unsubscribe(subscriber_id)
-        else:
-            LOGGER.debug(f"Could not unsubscribe {subscriber_id} from {state_name}: No such state name")
-            return False
+        if self._topics.unsubscribe(state_name, subscriber_id):
+            return True
+        LOGGER.debug(f"Could not unsubscribe {subscriber_id} from {state_name}: Not subscribed")
+        return False
 
     def unsubscribe_all(self, subscriber_id: str) -> bool:
         """
@@ -184,12 +884,7 @@ class StateManager:
         :param subscriber_id: the identifier of the subscriber
         :return: bool of success. It could fail due to no subscriptions of [caller_id]
         """
-        success: bool = False
-        for state in self._states.values():
-            if subscriber_id in state.get_subscriber_ids():
-                state.unsubscribe(subscriber_id)
-                success = True
-        return success
+        return self._topics.unsubscribe_all(subscriber_id)
 
     def get_state_names(self) -> List[str]:
         """
@@ -197,6 +892,337 @@ class StateManager:
         """
         return list(self._states.keys())
 
+    def set_computed_state(self, state_name: str, compute: Callable[..., Any], dependencies: List[str],
+                           type: type = None, immutable: bool = False, dispatcher: Optional[Dispatcher] = None,
+                           history_len: int = 10, history_delta: bool = False,
+                           history_max_bytes: Optional[int] = None) -> bool:
+        """
+        Creates a state, whose value is computed from the values of other states,
+        instead of subscribers computing aggregates and setting them as states.
+
+        It is recomputed lazily: only when it is read or has subscribers to notify and only if one of its
+        [dependencies] changed. If several of them change within a `transaction`, it is computed once.
+        Computed states can depend on computed states, they are recomputed in topological order.
+        If the value did not change, neither its subscribers nor the states depending on it are notified.
+
+        ```
+        state_manager.set_computed_state("total", lambda net, tax: net * (1 + tax), ["net", "tax"])
+        ```
+        :param state_name: the state identifier
+        :param compute: called with the values of [dependencies], None for the ones that are not set
+        :param dependencies: the names of the states the value is computed from
+        :param type: see `set_state`
+        :param immutable: see `set_state`
+        :param dispatcher: see `set_state`
+        :param history_len: see `set_state`
+        :param history_delta: see `set_state`
+        :param history_max_bytes: see `set_state`
+        :return: bool of success. It could fail due to an already existing [state_name]
+        :raises ValueError: if the state would depend on itself
+        """
+        with self._computation_lock:
+            if state_name in self._states:
+                LOGGER.debug(f"Could not set_computed_state {state_name}: The state name is already taken")
+                return False
+            if state_name in dependencies or self._get_dependents(state_name) & set(dependencies):
+                raise ValueError(f"{state_name} would depend on itself")
+
+            with self._locks.get(state_name):
+                self._states[state_name] = _ComputedState(name=state_name, compute=compute,
+                                                          dependencies=list(dependencies), type=type,
+                                                          immutable=immutable, dispatcher=dispatcher,
+                                                          history_len=history_len, history_delta=history_delta,
+                                                          history_max_bytes=history_max_bytes, topics=self._topics)
+            for dependency in dependencies:
+                self._dependents[dependency] = self._dependents.get(dependency, set()) | {state_name}
+        self._update_computed_states([state_name], include_given=True)
+        return True
+
+    def persist(self, journal: "StateJournal") -> int:
+        """
+        Restores the states of [journal] and records every following change in it,
+        so the states survive a restart of the process. Should be called once at startup.
+        Restored values replace the ones of already existing states, whose subscribers get notified.
+        The dispatchers of states are not persisted.
+
+        ```
+        state_manager.persist(StateJournal("state"))
+        ```
+        :param journal: the journal to restore from and write to
+        :return: the number of restored states
+        """
+        restored: Dict[str, Tuple[Any, Optional[Tuple]]] = self._restore(journal.restore)
+        StateManager._journal = journal
+        if any(state_name not in restored for state_name in self.get_state_names()):
+            # the states set before are not in the journal yet
+            journal.snapshot(self._get_persisted_states)
+        return len(restored)
+
+    def share(self, store: "SharedStateStore") -> int:
+        """
+        Shares the states with the [StateManager]s of other processes on the same host, which share the same [store].
+        The states of the [store] replace the ones of already existing states, whose subscribers get notified.
+        Afterwards every change is written to the [store] and the changes of the other processes are applied
+        in the background, notifying the subscribers of this process.
+        `get_state` keeps reading from memory, so it is as fast as without sharing.
+        Computed states are not shared, each process computes them from the shared states.
+
+        ```
+        state_manager.share(SharedStateStore("states.db"))
+        ```
+        :param store: the store to share the states through
+        :return: the number of states taken from the [store]
+        """
+        restored: Dict[str, Tuple[Any, Optional[Tuple]]] = self._restore(store.restore)
+        StateManager._shared_store = store
+        # the states set before are not shared yet
+        self._write_records([(state_name, state._value, state.get_settings())
+                             for state_name, state in list(self._states.items())
+                             if state_name not in restored and not isinstance(state, _ComputedState)])
+        store.start(self._apply_shared_changes)
+        return len(restored)
+
+    def _restore(self, load: Callable[[], Dict[str, Tuple[Any, Optional[Tuple]]]]) \
+            -> Dict[str, Tuple[Any, Optional[Tuple]]]:
+        """
+        Creates or updates the states with the values returned by [load] and notifies their subscribers
+        :return: what [load] returned
+        """
+        # the garbage collector would traverse the growing heap over and over while the states are created
+        gc_was_enabled: bool = gc.isenabled()
+        gc.disable()
+        try:
+            restored: Dict[str, Tuple[Any, Optional[Tuple]]] = load()
+            changed_states: List[_State] = []
+            with self._locks.all_of(list(restored.keys())):
+                for state_name, (value, settings) in restored.items():
+                    state: Optional[_State] = self._states.get(state_name)
+                    if state is None:
+                        state = self._states[state_name] = _State.from_settings(state_name, value, settings,
+                                                                                topics=self._topics)
+                        changed_states.append(state)
+                    elif not isinstance(state, _ComputedState):
+                        state._apply(state._prepare(value), notify=False)
+                        changed_states.append(state)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        for state in changed_states:
+            state.notify()
+        self._update_computed_states(list(restored.keys()))
+        return restored
+
+    def _apply_shared_changes(self, records: List["SharedRecord"]) -> None:
+        """
+        Applies the changes of other processes, that are newer than the values of this one
+        """
+        changed_states: List[_State] = []
+        changed_names: List[str] = []
+        for state_name, value, settings, sequence in records:
+            with self._locks.get(state_name):
+                state: Optional[_State] = self._states.get(state_name)
+                if isinstance(state, _ComputedState) or not self._shared_store.claim(state_name, sequence):
+                    continue
+                if state is None:
+                    state = self._states[state_name] = _State.from_settings(state_name, value, settings,
+                                                                            topics=self._topics)
+                else:
+                    # the value is unpickled and therefore already an own copy
+                    state._apply(freeze(value) if state._immutable else value, notify=False)
+                changed_states.append(state)
+                changed_names.append(state_name)
+        for state in changed_states:
+            state.notify()
+        self._update_computed_states(changed_names)
+
+    def _write_records(self, records: List[Tuple[str, Any, Optional[Tuple]]]) -> bool:
+        """
+        Writes the changes to the journal and the shared store.
+        Has to be called under the locks of the states of [records], so they are written in the order they are set
+        :return: if a snapshot of the journal is due
+        """
+        snapshot_due: bool = False
+        if self._journal is not None:
+            try:
+                snapshot_due = self._journal.append(records)
+            except Exception as e:
+                LOGGER.warning(f'Could not journal {[record[0] for record in records]} to {self._journal}: '
+                               f'{e.__class__.__name__}: {e}')
+        if self._shared_store is not None and records:
+            try:
+                self._shared_store.append(records)
+            except Exception as e:
+                LOGGER.warning(f'Could not share {[record[0] for record in records]} through {self._shared_store}: '
+                               f'{e.__class__.__name__}: {e}')
+        return snapshot_due
+
+    def _snapshot_if(self, snapshot_due: bool) -> None:
+        if not snapshot_due or self._journal is None:
+            return
+        try:
+            self._journal.snapshot(self._get_persisted_states)
+        except Exception as e:
+            LOGGER.warning(f'Could not write a snapshot to {self._journal}: {e.__class__.__name__}: {e}')
+
+    def _get_persisted_states(self) -> Dict[str, Tuple[Any, Optional[Tuple]]]:
+        return {state_name: (state._value, state.get_settings()) for state_name, state in list(self._states.items())
+                if not isinstance(state, _ComputedState)}
+
+    def _get_dependents(self, state_name: str) -> Set[str]:
+        """
+        :return: the names of all computed states, that directly or indirectly depend on [state_name]
+        """
+        dependents: Set[str] = set()
+        pending: List[str] = [state_name]
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if dependent not in dependents:
+                    dependents.add(dependent)
+                    pending.append(dependent)
+        return dependents
+
+    def _update_computed_states(self, state_names: List[str], include_given: bool = False) -> None:
+        """
+        Marks the computed states depending on the changed [state_names] as dirty
+        and recomputes and notifies the ones with subscribers, in topological order
+        :param include_given: if the [state_names] are computed states to update as well
+        """
+        if not include_given and not any(state_name in self._dependents for state_name in state_names):
+            return
+        changed_states: List[_State] = []
+        for state in self._invalidate(state_names, include_given):
+            if state.get_subscribers() and self._refresh(state):
+                changed_states.append(state)
+        for state in changed_states:
+            state.notify()
+
+    def _invalidate(self, state_names: List[str], include_given: bool = False) -> List[_ComputedState]:
+        """
+        Marks the computed states depending on [state_names] as dirty
+        :return: them in topological order, so each comes after all it depends on
+        """
+        # a depth first search yields each state after all its dependents, so the reversed order is topological
+        post_order: List[_ComputedState] = []
+        visited: Set[str] = set()
+
+        def visit(state_name: str):
+            for dependent in self._dependents.get(state_name, ()):
+                if dependent not in visited:
+                    visited.add(dependent)
+                    visit(dependent)
+                    post_order.append(self._states[dependent])
+
+        for state_name in state_names:
+            visit(state_name)
+            if include_given and state_name not in visited:
+                visited.add(state_name)
+                post_order.append(self._states[state_name])
+        post_order.reverse()
+        for state in post_order:
+            state._generation += 1
+        return post_order
+
+    def _refresh(self, state: _ComputedState) -> bool:
+        """
+        Recomputes a dirty computed state, if one of its dependencies changed since it was computed.
+        Only the computations of the same state wait on each other, [compute] runs without holding a stripe lock
+        :return: if its value changed
+        """
+        with state._compute_lock:
+            return self._recompute(state)
+
+    def _recompute(self, state: _ComputedState) -> bool:
+        """
+        Has to be called under the [_compute_lock] of [state]
+        """
+        if not state._dirty:
+            return False
+        generation: int = state._generation
+        dependencies: List[Optional[_State]] = [self._states.get(dependency) for dependency in state.dependencies]
+        for dependency in dependencies:
+            if isinstance(dependency, _ComputedState):
+                self._refresh(dependency)
+        input_versions: List[int] = [dependency._version if dependency is not None else -1
+                                     for dependency in dependencies]
+        if input_versions == state._input_versions:
+            self._clean(state, generation)
+            return False
+
+        try:
+            value: Any = state.compute(*[dependency.get_value() if dependency is not None else None
+                                         for dependency in dependencies])
+        except Exception as e:
+            LOGGER.warning(f"Could not compute {state.name}: {e.__class__.__name__}: {e}")
+            return False
+        is_first: bool = state._input_versions is None
+        state._input_versions = input_versions
+        if not state.accepts(value):
+            self._clean(state, generation)
+            LOGGER.warning(f"Could not compute {state.name}: {value} is not of type {state._type}")
+            return False
+        prepared: Any = state._prepare(value)
+        with self._locks.get(state.name):
+            if is_first:
+                state._value = prepared
+                state._version += 1
+                changed: bool = True
+            else:
+                # the stored value is prepared as well, e.g. frozen
+                changed = not _is_same(prepared, state._value)
+                if changed:
+                    state._apply(prepared, notify=False)
+            # after the value is set, so lock free readers never get the previous value of a clean state
+            self._clean(state, generation)
+        return changed
+
+    @staticmethod
+    def _clean(state: _ComputedState, generation: int) -> None:
+        """
+        Marks [state] as computed for [generation]. It stays dirty, if it was invalidated again since
+        """
+        state._computed_generation = generation
+
+    def _get_transaction(self) -> Optional[Dict[str, Tuple[_State, Any]]]:
+        return getattr(self._local, "transaction", None)
+
+    def _set_state_in_transaction(self, transaction: Dict[str, Tuple[_State, Any]], state_name: str, state: Any,
+                                  **state_kwargs) -> bool:
+        if isinstance(self._states.get(state_name), _ComputedState):
+            LOGGER.debug(f"Could not set_state {state_name}: It is a computed state")
+            return False
+        if state_name in transaction:
+            pending_state: _State = transaction[state_name][0]
+        elif state_name in self._states:
+            pending_state = self._states[state_name]
+        else:
+            pending_state = _State(name=state_name, value=state, topics=self._topics, **state_kwargs)
+            transaction[state_name] = (pending_state, pending_state._value)
+            return True
+        if not pending_state.accepts(state):
+            return False
+        transaction[state_name] = (pending_state, pending_state._prepare(state))
+        return True
+
+    def _commit(self, changes: Dict[str, Tuple[_State, Any]]):
+        changed_states: List[_State] = []
+        records: List[Tuple[str, Any, Optional[Tuple]]] = []
+        with self._locks.all_of(list(changes.keys())):
+            for state_name, (state, value) in changes.items():
+                if state_name not in self._states:
+                    state._value = value
+                    self._states[state_name] = state
+                    changed_states.append(state)
+                    records.append((state_name, value, state.get_settings()))
+                    continue
+                self._states[state_name]._apply(value, notify=False)
+                changed_states.append(self._states[state_name])
+                records.append((state_name, value, None))
+            snapshot_due: bool = self._write_records(records)
+        for state in changed_states:
+            state.notify()
+        self._update_computed_states(list(changes.keys()))
+        self._snapshot_if(snapshot_due)
+
 
 class StateManagerSingleton(StateManager, Singleton):
     """
@@ -206,18 +1232,115 @@ class StateManagerSingleton(StateManager, Singleton):
     pass
 
 
+_NO_DEFAULT: Any = object()
+
+
+class _ObservedAttribute:
+    """
+    A data descriptor for a public attribute of a `State` subclass with `descriptors=True`.
+    The value is kept in the instance `__dict__` under the same name (or in the slot, if the class declares one),
+    the subscribers of the instance are only looked up when it is set.
+    """
+
+    def __init__(self, name: str, default: Any = _NO_DEFAULT, slot: Any = None):
+        self.name: str = name
+        self.default: Any = default
+        self._slot: Any = slot
+
+    def __get__(self, instance: Optional["State"], owner: Optional[type] = None) -> Any:
+        if instance is None:
+            if self.default is _NO_DEFAULT:
+                # no default, e.g. for dataclasses
+                raise AttributeError(self.name)
+            return self.default
+        if self._slot is not None:
+            return self._slot.__get__(instance, owner)
+        try:
+            return instance.__dict__[self.name]
+        except KeyError:
+            if self.default is _NO_DEFAULT:
+                raise AttributeError(f"{type(instance).__name__!r} object has no attribute {self.name!r}")
+            return self.default
+
+    def __set__(self, instance: "State", value: Any) -> None:
+        if instance._immutable:
+            value = freeze(value)
+        if self._slot is not None:
+            self._slot.__set__(instance, value)
+        else:
+            instance.__dict__[self.name] = value
+        subscriptions: Optional[Dict[str, Dict[str, Subscriber]]] = instance.__dict__.get("_subscriptions")
+        if not subscriptions or self.name not in subscriptions:
+            return
+        for subscriber in list(subscriptions[self.name].values()):
+            subscriber.offer((id(instance), self.name), value if instance._immutable else deepcopy(value))
+
+
 class State:
     """
     A class to inherit from.
     All public setters will notify
+
+    If a subclass sets `_immutable = True`, public attributes are frozen once on assignment (see `util.freeze`)
+    and all subscribers get that same read-only snapshot instead of own deep copies.
+
+    A subclass declared with `descriptors=True` compiles its public attributes into descriptors once:
+
+    ```
+    class Position(State, descriptors=True):
+        x: float = 0.0
+        y: float = 0.0
+    ```
+
+    Then every instance has its own subscribers, assignments of private attributes are plain python assignments
+    and public ones only look up the subscribers of their attribute. Values are not copied on assignment,
+    only for the subscribers. Subclasses inherit the mode.
     """
     _subscriber: Dict[str, List[Subscriber]] = {}
+    _immutable: bool = False
+    # the compiled attributes, if the class is declared with `descriptors=True`
+    _observed_attributes: Optional[Dict[str, _ObservedAttribute]] = None
+
+    def __init_subclass__(cls, descriptors: Optional[bool] = None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if descriptors is None:
+            descriptors = cls._observed_attributes is not None
+        if not descriptors:
+            return
+
+        observed_attributes: Dict[str, _ObservedAttribute] = dict(cls._observed_attributes or {})
+        names: List[str] = [name for name in cls.__dict__.get("__annotations__", {}) if name[:1] != "_"]
+        names.extend(name for name, value in cls.__dict__.items()
+                     if name[:1] != "_" and name not in names and not callable(value)
+                     and not isinstance(value, (property, classmethod, staticmethod, _ObservedAttribute)))
+        for name in names:
+            value: Any = cls.__dict__.get(name, _NO_DEFAULT)
+            is_slot: bool = name in cls.__dict__.get("__slots__", ())
+            observed_attribute = _ObservedAttribute(name, default=_NO_DEFAULT if is_slot else value,
+                                                    slot=value if is_slot else None)
+            setattr(cls, name, observed_attribute)
+            observed_attributes[name] = observed_attribute
+        cls._observed_attributes = observed_attributes
+        # the descriptors take care of the public attributes. A __setattr__ the class or a base defines itself is kept,
+        # its super().__setattr__ calls end up in object.__setattr__ below
+        if cls.__setattr__ is State.__setattr__:
+            cls.__setattr__ = object.__setattr__
 
     def __setattr__(self, key: str, value):
+        if self._observed_attributes is not None:
+            object.__setattr__(self, key, value)
+            return
+        if self._immutable and key[0] != "_":
+            value = freeze(value)
+            object.__setattr__(self, key, value)
+            for subscriber in self._subscriber.get(key, []):
+                subscriber.offer((id(self), key), value)
+            return
+
         object.__setattr__(self, key, deepcopy(value))
         if key[0] != "_" and key in self._subscriber:
             for subscriber in self._subscriber[key]:
-                subscriber.notify(deepcopy(value))
+                subscriber.offer((id(self), key), deepcopy(value))
 
     def subscribe(self, subscriber: Subscriber, attributes: Union[str, List[str]] = None) -> bool:
         """
@@ -227,6 +1350,8 @@ class State:
         :return: bool of success. It could fail due invalid [attributes] or already subscription of [subscriber].
                  A fail only means 'something went wrong' not all.
         """
+        if self._observed_attributes is not None:
+            return self._subscribe_observed(subscriber, attributes)
         success: bool = True
         if attributes is None:
             attributes = get_pub_attr_of_class(self.__class__)
@@ -260,6 +1385,8 @@ class State:
             return self.unsubscribe_all(subscriber_id)
         if isinstance(attributes, str):
             attributes = [attributes]
+        if self._observed_attributes is not None:
+            return self._unsubscribe_observed(subscriber_id, attributes)
 
         subscriber = self._get_subscriber(subscriber_id)
         success: bool = True
@@ -282,6 +1409,9 @@ class State:
         :param subscriber_id: the identifier of the subscriber
         :return: bool of success. Could be False due no valid subscriptions.
         """
+        if self._observed_attributes is not None:
+            return self._unsubscribe_observed(subscriber_id, list(self._get_subscribed_attributes().get(subscriber_id,
+                                                                                                         ())))
         success: bool = False
         subscriber = self._get_subscriber(subscriber_id)
         for attribute in self._subscriber.keys():
@@ -298,3 +1428,62 @@ class State:
         for subscriber in all_subscribers:
             if subscriber.id == subscriber_id:
                 return subscriber
+
+    def _get_subscriptions(self) -> Dict[str, Dict[str, Subscriber]]:
+        """
+        :return: the subscribers by id per attribute of this instance
+        """
+        subscriptions: Optional[Dict[str, Dict[str, Subscriber]]] = self.__dict__.get("_subscriptions")
+        if subscriptions is None:
+            subscriptions = self.__dict__["_subscriptions"] = {}
+        return subscriptions
+
+    def _get_subscribed_attributes(self) -> Dict[str, Set[str]]:
+        """
+        :return: the attributes per subscriber id of this instance
+        """
+        subscribed_attributes: Optional[Dict[str, Set[str]]] = self.__dict__.get("_subscribed_attributes")
+        if subscribed_attributes is None:
+            subscribed_attributes = self.__dict__["_subscribed_attributes"] = {}
+        return subscribed_attributes
+
+    def _subscribe_observed(self, subscriber: Subscriber, attributes: Union[str, List[str], None]) -> bool:
+        if attributes is None:
+            attributes = list(self._observed_attributes.keys())
+        if isinstance(attributes, str):
+            attributes = [attributes]
+
+        success: bool = True
+        subscriptions: Dict[str, Dict[str, Subscriber]] = self._get_subscriptions()
+        subscribed_attributes: Dict[str, Set[str]] = self._get_subscribed_attributes()
+        for attribute in attributes:
+            if attribute not in self._observed_attributes:
+                LOGGER.debug(f"{attribute} is not an subscribable attribute of {self.__class__.__name__}: "
+                             f"not subscribed")
+                success = False
+                continue
+            subscribers: Dict[str, Subscriber] = subscriptions.setdefault(attribute, {})
+            if subscriber.id in subscribers:
+                LOGGER.debug(f"{subscriber.id} has already subscribed to {self.__class__.__name__}.{attribute}")
+                success = False
+                continue
+            subscribers[subscriber.id] = subscriber
+            subscribed_attributes.setdefault(subscriber.id, set()).add(attribute)
+        return success
+
+    def _unsubscribe_observed(self, subscriber_id: str, attributes: List[str]) -> bool:
+        success: bool = bool(attributes)
+        subscriptions: Dict[str, Dict[str, Subscriber]] = self._get_subscriptions()
+        subscribed_attributes: Dict[str, Set[str]] = self._get_subscribed_attributes()
+        for attribute in attributes:
+            subscribers: Optional[Dict[str, Subscriber]] = subscriptions.get(attribute)
+            if subscribers is None or subscribers.pop(subscriber_id, None) is None:
+                LOGGER.debug(f"{subscriber_id} has not subscribed to {self.__class__.__name__}.{attribute}")
+                success = False
+                continue
+            if not subscribers:
+                del subscriptions[attribute]
+            subscribed_attributes[subscriber_id].discard(attribute)
+            if not subscribed_attributes[subscriber_id]:
+                del subscribed_attributes[subscriber_id]
+        return success
@@ -399,6 +399,33 @@ def load_file(filename: str, is_abs: bool = False, raw: bool = False) -> any:
         return stream.read()
 
 
+def load_pickle_stream(filename: str, is_abs: bool = False) -> List[Any]:
+    """
+    loads all objects of a file they were pickled to one after another, e.g. an append-only journal.
+    A truncated last object, as left by a crash while writing it, is ignored.
+
+    :param filename: the path to the file to load
+    :param is_abs: determines if the given path is absolute or relative to project root
+    :return: the objects in the order they were written, an empty list if the file does not exist
+    """
+    file_path: str = filename if is_abs else to_abs_file_path(filename)
+    objects: List[Any] = []
+    if not os.path.isfile(file_path):
+        return objects
+
+    with open(file_path, 'rb') as file:
+        unpickler = pickle.Unpickler(file)
+        while True:
+            try:
+                objects.append(unpickler.load())
+            except EOFError:
+                break
+            except (pickle.UnpicklingError, ValueError, TypeError, AttributeError) as e:
+                LOGGER.warning(f'Ignored the truncated end of {file_path}: {e.__class__.__name__}: {e}')
+                break
+    return objects
+
+
 def get_file_base(filepath: str) -> str:
     """
     :param filepath: the absolute filepath
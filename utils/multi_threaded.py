@@ -1,5 +1,5 @@
 import inspect
-from collections import Iterable
+from collections.abc import Iterable
 from typing import Callable, Optional, Dict, Any, Union, List, Tuple
 
 from .StoppableThreadWithReturnValue import StoppableThreadWithReturnValue
@@ -14,7 +14,7 @@ def multi_threaded(funcs: List[Union[Callable, Tuple[Callable, List[Any], Dict[s
     """
     result_dict: Dict[Union[Callable, str], Any] = {}
     for func_tuple in funcs:
-        id: str
+        id: Optional[str] = None
         args = []
         kwargs = {}
         func: Optional[Callable] = None
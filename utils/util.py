@@ -5,7 +5,8 @@ import logging
 import re
 import socket
 import subprocess
-from copy import copy
+import sys
+from copy import copy, deepcopy
 from inspect import isclass
 from typing import Dict, Union, Optional, List, Any, Callable
 
@@ -43,6 +44,82 @@ def can_fail(func: Callable[[List[Any], List[Any]], Any]):
     return wrapper
 
 
+class FrozenDict(dict):
+    """
+    A read-only dict. Every mutating method raises a TypeError.
+    Being immutable, copying it returns the same object and it is hashable if its values are.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"{self.__class__.__name__} is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __hash__(self) -> int:
+        return hash(frozenset(self.items()))
+
+    def __reduce__(self):
+        return self.__class__, (dict(self),)
+
+    def __copy__(self) -> "FrozenDict":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "FrozenDict":
+        return self
+
+
+_IMMUTABLE_TYPES: tuple = (str, bytes, int, float, complex, bool, type(None), frozenset, FrozenDict)
+
+
+def freeze(value: Any) -> Any:
+    """
+    Converts [value] recursively into a read-only snapshot:
+    dicts become FrozenDicts, lists and tuples become tuples and sets become frozensets.
+    Already frozen parts are reused as they are, so a snapshot built from another one shares its unchanged parts.
+    Any other object is deep copied once, because it can not be frozen generically.
+
+    example:
+
+    ```
+    snapshot = freeze({"ids": [1, 2], "names": {"a"}})  # FrozenDict({"ids": (1, 2), "names": frozenset({"a"})})
+    snapshot["ids"] = []  # TypeError
+    ```
+    """
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list) or type(value) is tuple:
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, tuple) and hasattr(value, "_make"):
+        return value._make(freeze(item) for item in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return deepcopy(value)
+
+
+def get_deep_size(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    Estimates the memory usage of an object, including everything it references.
+    Objects referenced multiple times are only counted once
+    :param obj: the object to measure
+    :param seen: the ids of the objects that are already counted
+    :return: an estimation of the bytes [obj] and everything it contains occupy
+    """
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size: int = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(get_deep_size(k, seen) + get_deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(get_deep_size(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += get_deep_size(vars(obj), seen)
+    return size
+
+
 def list_to_dict(items: List[Any], key: str) -> Dict[Any, Any]:
     """
     transforms a list to a dict.